@@ -9,12 +9,42 @@ function! s:init()
   let g:tplearn_spellcheck = get(g:, 'tplearn_spellcheck', 0)
   let g:tplearn_log = get(g:, 'tplearn_log', '')
   let g:tplearn_log_level = get(g:, 'tplearn_log_level', 'info')
+  let g:tplearn_lazy = get(g:, 'tplearn_lazy', 0)
 
   call _typitlearn_init()
+  call s:watch_config()
+
+  if !empty(g:tplearn_log)
+    " Log records are written in the background, write the last ones
+    augroup typitlearn
+      autocmd VimLeavePre * call _typitlearn_flush_log()
+    augroup END
+  endif
+
+  if g:tplearn_lazy
+    augroup typitlearn
+      autocmd InsertEnter * ++once call _typitlearn_define()
+    augroup END
+  endif
 
   call s:init_mappings()
 endfunction
 
+" The plugin caches configuration until one of these variables changes
+let s:config_vars = ['tplearn_dir', 'tplearn_undo', 'tplearn_spellcheck',
+      \ 'tplearn_lazy', 'tplearn_fix_all_buffers', 'tplearn_status_interval',
+      \ 'tplearn_lazy_snapshot']
+
+function! s:watch_config()
+  for l:name in s:config_vars
+    call dictwatcheradd(g:, l:name, function('s:config_changed'))
+  endfor
+endfunction
+
+function! s:config_changed(...)
+  call _typitlearn_config_changed()
+endfunction
+
 function s:init_mappings()
   nnoremap <buffer> <plug>(tplearn_record) :TypitLearnRecord<cr>
   nnoremap <buffer> <plug>(tplearn_edit) :TypitLearnEdit<cr>
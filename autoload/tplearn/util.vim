@@ -8,6 +8,17 @@ function! tplearn#util#message(msg)
   echohl None
 endfunction
 
+" Same as tplearn#util#message, without filling :messages
+function! tplearn#util#status(msg)
+  if mode() == 'i'
+    set nosmd
+  endif
+
+  echohl ModeMsg
+  echo "[TypitLearn] " . a:msg
+  echohl None
+endfunction
+
 function! tplearn#util#clearmsg()
   echo
 endfunction
@@ -31,6 +42,127 @@ function! tplearn#util#abbreviate(typo, fix)
   let g:tplearn_abbrev[a:typo] = a:fix
 endfunction
 
+" Insert mode abbreviations not defined by TypitLearn, as a {lhs: rhs} dict.
+function! tplearn#util#abbreviations() abort
+  let l:abbrevs = {}
+
+  for l:line in split(execute('iabbrev'), "\n")
+    let l:lhs = get(split(l:line), 1, '')
+
+    if l:lhs ==# '' || has_key(g:tplearn_abbrev, l:lhs)
+      continue
+    endif
+
+    let l:rhs = maparg(l:lhs, 'i', 1)
+
+    if l:rhs !=# '' && l:rhs !~# 'tplearn#'
+      let l:abbrevs[l:lhs] = l:rhs
+    endif
+  endfor
+
+  return l:abbrevs
+endfunction
+
+" Spelling verdict of each word, as returned by spellbadword(): 'bad', 'rare',
+" 'caps', 'local', or '' for valid words. Verdicts depend on these
+" buffer-local options, which are returned with them.
+function! tplearn#util#spellcheck(words) abort
+  return {'spelllang': &spelllang, 'spellfile': s:spellfiles(),
+        \ 'verdicts': map(copy(a:words), 'spellbadword(v:val)[1]')}
+endfunction
+
+" Open the review buffer of flagged fixes, or update it if already open.
+" Writing it sends the fixes that are left to the plugin, wiping it discards
+" them.
+function! tplearn#util#review(lines) abort
+  let l:winnr = bufwinnr(bufnr('^typitlearn://review$'))
+
+  if l:winnr > 0
+    execute l:winnr . 'wincmd w'
+  else
+    silent botright split typitlearn://review
+  endif
+
+  setlocal buftype=acwrite bufhidden=wipe noswapfile filetype=vim
+  silent %delete _
+  call setline(1, a:lines)
+  setlocal nomodified
+
+  augroup typitlearn_review
+    autocmd! * <buffer>
+    autocmd BufWriteCmd <buffer> call s:review_write()
+    autocmd BufWipeout <buffer> call _typitlearn_review([])
+  augroup END
+endfunction
+
+function! s:review_write()
+  call _typitlearn_review(getline(1, '$'))
+  setlocal nomodified
+endfunction
+
+" With g:tplearn_lazy_snapshot, the buffer isn't sent when recording starts:
+" visible lines, then lines around the cursor, are sent before they change.
+function! tplearn#util#prefetch_start() abort
+  call _typitlearn_prefetch(bufnr(''), line('w0') - 1, getline('w0', 'w$'))
+  let b:tplearn_prefetched = 0
+
+  augroup typitlearn_prefetch
+    autocmd! * <buffer>
+    autocmd CursorMoved,CursorMovedI,InsertEnter <buffer>
+          \ call s:prefetch_cursor()
+  augroup END
+endfunction
+
+function! tplearn#util#prefetch_stop() abort
+  silent! autocmd! typitlearn_prefetch * <buffer>
+  unlet! b:tplearn_prefetched
+endfunction
+
+function! s:prefetch_cursor()
+  let l:line = line('.')
+
+  if l:line != b:tplearn_prefetched
+    let b:tplearn_prefetched = l:line
+    call _typitlearn_prefetch(bufnr(''), max([l:line - 2, 0]),
+          \ getline(max([l:line - 1, 1]), l:line + 1))
+  endif
+endfunction
+
+function! tplearn#util#stats_complete(arglead, cmdline, cursorpos)
+  return filter(['on', 'off', 'reset'], 'v:val =~# "^" . a:arglead')
+endfunction
+
+" Configuration read by the plugin, fetched at once and cached until changed
+function! tplearn#util#config() abort
+  return {
+        \ 'dir': g:tplearn_dir,
+        \ 'undo': g:tplearn_undo,
+        \ 'spellcheck': get(g:, 'tplearn_spellcheck', 0),
+        \ 'lazy': get(g:, 'tplearn_lazy', 0),
+        \ 'fix_all_buffers': g:tplearn_fix_all_buffers,
+        \ 'status_interval': g:tplearn_status_interval,
+        \ 'home': $HOME,
+        \ 'xdg_config_home': $XDG_CONFIG_HOME,
+        \ 'has_nvim': has('nvim'),
+        \ 'lazy_snapshot': g:tplearn_lazy_snapshot,
+        \ }
+endfunction
+
+" Word lists zg and zw add words to: 'spellfile', or its default in the
+" first 'runtimepath' directory
+function! s:spellfiles() abort
+  if &spellfile !=# ''
+    return map(split(&spellfile, ','), 'fnamemodify(v:val, ":p")')
+  endif
+
+  let l:name = 'spell/' . matchstr(&spelllang, '^[^_,]*') . '.'
+        \ . &encoding . '.add'
+  let l:files = globpath(&runtimepath, l:name, 0, 1)
+
+  return empty(l:files) ? [split(&runtimepath, ',')[0] . '/' . l:name]
+        \ : l:files
+endfunction
+
 " The 'tp_record' event is only used for the test suite
 function! tplearn#util#notify(value)
   call rpcnotify(0, 'tp_record', a:value)
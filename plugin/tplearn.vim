@@ -3,6 +3,9 @@ let g:tplearn_log = get(g:, 'tplearn_log', 0)
 let g:tplearn_init = get(g:, 'tplearn_init', 0)
 let g:tplearn_undo = get(g:, 'tplearn_undo', 1)
 let g:tplearn_dir = get(g:, 'tplearn_dir', '')
+let g:tplearn_fix_all_buffers = get(g:, 'tplearn_fix_all_buffers', 0)
+let g:tplearn_status_interval = get(g:, 'tplearn_status_interval', 100)
+let g:tplearn_lazy_snapshot = get(g:, 'tplearn_lazy_snapshot', 0)
 let g:tplearn_abbrev = {}
 
 call tplearn#init#initTypitLearn()
@@ -7,11 +7,15 @@ Author: Gabriel Alcaras
 License: GNU GPL v3
 """
 
-import numpy as np
+import os
+
 import pynvim
 
 from tplearn import logger
+from tplearn.batch import RequestBatch
 from tplearn.manager import TypitLearnManager
+from tplearn.stats import STATS
+from tplearn.status import StatusUpdater
 from tplearn.tracker import TypitLearnTracker
 
 @pynvim.plugin
@@ -23,21 +27,40 @@ class TypitLearn(logger.LoggingMixin):
         self.nvim = nvim
 
         self.manager = TypitLearnManager(self.nvim)
-        self.tracker = TypitLearnTracker()
+        self.status = StatusUpdater(self.nvim)
 
-        self._record_first = True
+        # Recording sessions: a tracker for each recorded buffer number
+        self._sessions = {}
+        self._line_counts = {}
+        self._review_buffer = None
 
     @pynvim.function('_typitlearn_init')
     def _init(self, *args):
         def init_functions():
             self._init_log()
             yield
-            self.manager.load_abbreviations()
+            self.manager.load_abbreviations(self.manager.config['lazy'])
             yield
 
         for _ in init_functions():
             pass
 
+    @pynvim.function('_typitlearn_config_changed', sync=False)
+    def _config_changed(self, *args):
+        self.manager.config.invalidate()
+
+    @pynvim.function('_typitlearn_prefetch', sync=False)
+    def _prefetch(self, args):
+        bufnr, firstline, linedata = args
+        tracker = self._sessions.get(bufnr)
+
+        if tracker is not None:
+            tracker.prefetch(bufnr, firstline, linedata)
+
+    @pynvim.function('_typitlearn_define')
+    def _define(self, *args):
+        self.manager.define_abbreviations()
+
     def _init_log(self, *args):
         try:
             log_file = self.nvim.eval('g:tplearn_log')
@@ -49,25 +72,66 @@ class TypitLearn(logger.LoggingMixin):
         if log_file and log_level:
             self._setup_log(log_file, log_level, nvim_id)
 
+    @pynvim.function('_typitlearn_flush_log', sync=True)
+    def _flush_log_on_exit(self, *args):
+        self._flush_log()
+
     @pynvim.rpc_export('nvim_buf_lines_event')
+    @STATS.timed
     def _on_buf_lines_event(self, *args):
         buf = args[0]
+        tracker = self._sessions.get(buf.number)
+
+        if tracker is None:
+            return
+
         firstline = args[2]
-        # When lastline is -1, use last line number instead
-        lastline = len(buf[:])-1 if args[3] == -1 else args[3]
         linedata = args[4]
+        lastline = self._track_line_count(buf, firstline, args[3], linedata)
 
         self.debug('Changed lines: {bufnum: %s, firstline: %s, lastline: %s, '
                    'linedata: %s',
                    buf.number, firstline, lastline, linedata)
 
-        if self._record_first:
-            self.tracker.track_buffer_updates(buf, firstline, lastline,
-                                              linedata)
-            self._record_first = False
+        if not tracker.tracks(buf):
+            tracker.track_buffer_updates(buf, firstline, lastline, linedata)
+        else:
+            tracker.track_replaced_words(buf, firstline, lastline, linedata)
+
+        self.status.update(tracker.abbrev(), 'Recording:')
+
+    def _track_line_count(self, buf, firstline, lastline, linedata):
+        """Keep track of the line count of buf from the changes sent by
+        Neovim, so that the buffer never has to be fetched to know its size.
+
+        :returns: [int] last line of changes (-1 replaced by last line number)"""
 
-        self.tracker.track_replaced_words(buf, firstline, lastline, linedata)
-        self.manager.show_abbrevs(self.tracker.abbrev(), 'Recording:')
+        count = self._line_counts.get(buf.number)
+
+        if lastline == -1:
+            # Lines from firstline to the end of the buffer were sent: when
+            # sent from the start (attach snapshot), that's the whole buffer.
+            if firstline == 0:
+                count = len(linedata)
+            else:
+                count = self._line_count(buf)
+            lastline = count - 1
+        elif count is not None:
+            count += len(linedata) - (lastline - firstline)
+
+        self._line_counts[buf.number] = count
+        return lastline
+
+    def _line_count(self, buf):
+        """Return line count of buf, only asking Neovim when it is unknown"""
+
+        count = self._line_counts.get(buf.number)
+
+        if count is None:
+            count = self.nvim.request('nvim_buf_line_count', buf)
+            self._line_counts[buf.number] = count
+
+        return count
 
     @pynvim.rpc_export('nvim_buf_changedtick_event')
     def _on_buf_changedtick_event(self, *args):
@@ -75,18 +139,28 @@ class TypitLearn(logger.LoggingMixin):
 
     @pynvim.rpc_export('nvim_buf_detach_event')
     def _on_nvim_buf_detach_event(self, *args):
-        return
+        buf = args[0]
+        self._line_counts.pop(buf.number, None)
+
+        # Buffer unloaded while recording: learn what was recorded so far
+        if buf.number in self._sessions:
+            self.info('Buffer %s detached while recording', buf.number)
+            self._record_stop(buf, detached=True)
+            self.nvim.command('call tplearn#util#notify("stop")')
+            self.nvim.vars['tplearn_record'] = int(bool(self._sessions))
 
     @pynvim.command('TypitLearnRecord', nargs=0)
     def _toggle_record(self):
-        if self.nvim.eval('g:tplearn_record') == 0:
-            self._record_start()
+        buf = self.nvim.current.buffer
+
+        if buf.number not in self._sessions:
+            self._record_start(buf)
             self.nvim.command('call tplearn#util#notify("start")')
-            self.nvim.vars['tplearn_record'] = 1
         else:
-            self._record_stop()
+            self._record_stop(buf)
             self.nvim.command('call tplearn#util#notify("stop")')
-            self.nvim.vars['tplearn_record'] = 0
+
+        self.nvim.vars['tplearn_record'] = int(bool(self._sessions))
 
     @pynvim.command('TypitLearnEdit', nargs=0)
     def _edit_abbrev_file(self):
@@ -96,31 +170,113 @@ class TypitLearn(logger.LoggingMixin):
     def _undo_last(self):
         self.manager.rm_last_abbrevs()
 
+    @pynvim.command('TypitLearnFixFiles', nargs=1, complete='dir')
+    def _fix_files(self, args):
+        self.manager.fix_files(args[0])
+
+    @pynvim.command('TypitLearnStats', nargs='?',
+                    complete='customlist,tplearn#util#stats_complete')
+    def _stats(self, args):
+        action = args[0] if args else ''
+
+        if action == 'on':
+            # Nvim copies made by with_decode() (e.g. by the plugin host)
+            # share the session but not nvim.request: count at the session
+            STATS.enable(self.nvim._session) #pylint: disable=protected-access
+        elif action == 'off':
+            STATS.disable()
+        elif action == 'reset':
+            STATS.reset()
+        elif action:
+            path = os.path.expanduser(action)
+
+            try:
+                STATS.dump(path)
+            except OSError as error:
+                self.error('Could not write stats to %s: %s', path, error)
+                self.nvim.call('tplearn#util#message',
+                               f'Could not write stats to {path}')
+            else:
+                self.nvim.call('tplearn#util#message',
+                               f'Stats written to {path}')
+            return
+
+        self.nvim.out_write('\n'.join(STATS.report()) + '\n')
+
     @pynvim.command('TypitLearnReload', nargs=0)
     def _reload(self):
+        self.manager.invalidate_other_abbreviations()
         self.manager.load_abbreviations()
 
-    def _record_start(self):
-        self.info('Start recording')
-        self.nvim.request('nvim_buf_attach',
-                          self.nvim.current.buffer.number,
-                          True,
-                          {})
-        self.nvim.call('tplearn#util#message', 'Recording')
+    def _record_start(self, buf):
+        self.info('Start recording buffer %s', buf.number)
+        self.status.interval = self.manager.config['status_interval'] / 1000
+        lazy = self.manager.config['lazy_snapshot']
+        self._start_session(buf, self._line_count(buf) if lazy else None)
+
+        # Without the whole buffer, lines are prefetched by autocommands
+        # just before they are changed
+        with RequestBatch(self.nvim) as batch:
+            batch.request('nvim_buf_attach', buf, not lazy, {})
+
+            if lazy:
+                batch.call('tplearn#util#prefetch_start')
+
+            batch.call('tplearn#util#message', 'Recording')
+
+    def _start_session(self, buf, line_count=None):
+        tracker = TypitLearnTracker()
+
+        if line_count is not None:
+            tracker.track_lazily(buf, line_count)
+
+        self._sessions[buf.number] = tracker
 
-    def _record_stop(self):
-        self.info('Stop recording')
-        self.nvim.request('nvim_buf_detach', self.nvim.current.buffer.number)
-        self._learn()
+    def _record_stop(self, buf, detached=False):
+        """Stop recording buf and learn its fixes. When buf was detached by
+        Neovim (e.g. unloaded), typos can't be fixed in it."""
 
-        self.tracker.reset()
-        self._record_first = True
+        self.info('Stop recording buffer %s', buf.number)
+        tracker = self._sessions.pop(buf.number)
+        self._line_counts.pop(buf.number, None)
 
-    def _learn(self):
-        if not self.tracker.abbrev:
+        if not detached:
+            with RequestBatch(self.nvim) as batch:
+                batch.request('nvim_buf_detach', buf)
+                batch.call('tplearn#util#prefetch_stop')
+
+        # A pending status update would be shown over recorded fixes
+        self.status.reset()
+        self._learn(tracker, None if detached else buf)
+
+        tracker.reset()
+
+    def _learn(self, tracker, buf):
+        saved = self.manager.save_abbreviations(tracker.abbrev())
+        self.manager.show_abbrevs(saved, 'Recorded:')
+
+        if buf is not None:
+            self.manager.fix_typos(saved,
+                                   self.manager.config['fix_all_buffers'],
+                                   buf)
+
+        # Typos found in the review buffer are fixed in this buffer
+        if self.manager.review_flagged():
+            self._review_buffer = buf
+
+    @pynvim.function('_typitlearn_review', sync=True)
+    def _review(self, args):
+        saved = self.manager.save_reviewed(args[0])
+
+        if saved is None:
             return
 
-        saved = self.manager.save_abbreviations(self.tracker.abbrev())
         self.manager.show_abbrevs(saved, 'Recorded:')
-        self.manager.fix_typos(saved)
-        self.manager.load_abbreviations()
+
+        buf = self._review_buffer
+
+        if saved and buf is not None and buf.valid:
+            self.manager.fix_typos(saved,
+                                   self.manager.config['fix_all_buffers'], buf)
+
+        self._review_buffer = None
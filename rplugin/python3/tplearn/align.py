@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: align.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+# Largest (old tokens x new tokens) region where typos are matched to fixes
+# by edit distance when words were added or removed.
+MAX_FUZZY_REGION = 4096
+
+
+def damerau_levenshtein(source, target, limit=None):
+    """Optimal string alignment distance between source and target, computed
+    with three rows only.
+
+    :source: [str]
+    :target: [str]
+    :limit: [int] stop as soon as the distance is known to exceed limit
+    :returns: [int] distance, or limit+1 if it exceeds limit"""
+
+    if source == target:
+        return 0
+
+    if len(source) < len(target):
+        source, target = target, source
+
+    if limit is not None and len(source) - len(target) > limit:
+        return limit + 1
+
+    before = None
+    previous = list(range(len(target) + 1))
+
+    for i, s_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+
+        for j, t_char in enumerate(target, 1):
+            cost = 0 if s_char == t_char else 1
+            current[j] = min(previous[j] + 1,
+                             current[j-1] + 1,
+                             previous[j-1] + cost)
+
+            if (before is not None and i > 1 and j > 1
+                    and s_char == target[j-2] and source[i-2] == t_char):
+                current[j] = min(current[j], before[j-2] + 1)
+
+        if limit is not None and min(current) > limit:
+            return limit + 1
+
+        before, previous = previous, current
+
+    return previous[-1]
+
+def max_typo_distance(typo, fix):
+    """Largest edit distance for fix to be a plausible fix of typo"""
+    return max(2, max(len(typo), len(fix)) // 3)
+
+def is_plausible_fix(typo, fix):
+    """Whether fix is close enough to typo to be a fix of it"""
+    limit = max_typo_distance(typo, fix)
+    return damerau_levenshtein(typo, fix, limit) <= limit
+
+def _middle_snake(old, new, o_lo, o_hi, n_lo, n_hi):
+    """Find the middle snake of the shortest edit script between
+    old[o_lo:o_hi] and new[n_lo:n_hi] (Myers, linear space).
+
+    :returns: [tuple] (x, y) split point, or None if nothing is common"""
+
+    len_o, len_n = o_hi - o_lo, n_hi - n_lo
+    max_d = (len_o + len_n + 1) // 2
+    offset = max_d + 1
+    forward = [-1] * (2 * offset + 2)
+    backward = [-1] * (2 * offset + 2)
+    forward[offset + 1] = backward[offset + 1] = 0
+    delta = len_o - len_n
+    odd = delta % 2 != 0
+    f_start = f_end = b_start = b_end = 0
+
+    for d in range(max_d + 1):
+        for k in range(-d + f_start, d + 1 - f_end, 2):
+            if k == -d or (k != d and forward[offset+k-1] < forward[offset+k+1]):
+                x = forward[offset + k + 1]
+            else:
+                x = forward[offset + k - 1] + 1
+            y = x - k
+
+            while (x < len_o and y < len_n
+                   and old[o_lo + x] == new[n_lo + y]):
+                x += 1
+                y += 1
+
+            forward[offset + k] = x
+
+            if x > len_o:
+                f_end += 2
+            elif y > len_n:
+                f_start += 2
+            elif odd:
+                b_k = offset + delta - k
+                if 0 <= b_k < len(backward) and backward[b_k] != -1:
+                    if x >= len_o - backward[b_k]:
+                        return x, y
+
+        for k in range(-d + b_start, d + 1 - b_end, 2):
+            if k == -d or (k != d and backward[offset+k-1] < backward[offset+k+1]):
+                x = backward[offset + k + 1]
+            else:
+                x = backward[offset + k - 1] + 1
+            y = x - k
+
+            while (x < len_o and y < len_n
+                   and old[o_hi - x - 1] == new[n_hi - y - 1]):
+                x += 1
+                y += 1
+
+            backward[offset + k] = x
+
+            if x > len_o:
+                b_end += 2
+            elif y > len_n:
+                b_start += 2
+            elif not odd:
+                f_k = offset + delta - k
+                if 0 <= f_k < len(forward) and forward[f_k] != -1:
+                    f_x = forward[f_k]
+                    if f_x >= len_o - x:
+                        return f_x, f_x - (f_k - offset)
+
+    return None
+
+def _matching_blocks(old, new, o_lo, o_hi, n_lo, n_hi, blocks):
+    while o_lo < o_hi and n_lo < n_hi and old[o_lo] == new[n_lo]:
+        blocks.append((o_lo, n_lo))
+        o_lo += 1
+        n_lo += 1
+
+    suffix = []
+    while o_lo < o_hi and n_lo < n_hi and old[o_hi-1] == new[n_hi-1]:
+        o_hi -= 1
+        n_hi -= 1
+        suffix.append((o_hi, n_hi))
+
+    if o_lo < o_hi and n_lo < n_hi:
+        split = _middle_snake(old, new, o_lo, o_hi, n_lo, n_hi)
+
+        if split is not None:
+            o_mid, n_mid = o_lo + split[0], n_lo + split[1]
+            _matching_blocks(old, new, o_lo, o_mid, n_lo, n_mid, blocks)
+            _matching_blocks(old, new, o_mid, o_hi, n_mid, n_hi, blocks)
+
+    blocks.extend(reversed(suffix))
+
+def diff_opcodes(old, new):
+    """Shortest edit script between two sequences, as difflib opcodes
+    (tag, i1, i2, j1, j2) with tag in 'equal', 'replace', 'insert' and
+    'delete'.
+
+    Uses Myers' linear space refinement, so memory stays proportional to
+    the length of the sequences."""
+
+    matches = []
+    _matching_blocks(old, new, 0, len(old), 0, len(new), matches)
+    matches.append((len(old), len(new)))
+
+    opcodes = []
+    i = j = 0
+    for o_idx, n_idx in matches:
+        if i < o_idx and j < n_idx:
+            opcodes.append(('replace', i, o_idx, j, n_idx))
+        elif i < o_idx:
+            opcodes.append(('delete', i, o_idx, j, n_idx))
+        elif j < n_idx:
+            opcodes.append(('insert', i, o_idx, j, n_idx))
+
+        if o_idx < len(old):
+            if opcodes and opcodes[-1][0] == 'equal' and opcodes[-1][2] == o_idx:
+                tag, i_1, _, j_1, _ = opcodes.pop()
+                opcodes.append((tag, i_1, o_idx + 1, j_1, n_idx + 1))
+            else:
+                opcodes.append(('equal', o_idx, o_idx + 1, n_idx, n_idx + 1))
+
+        i, j = o_idx + 1, n_idx + 1
+
+    return opcodes
+
+def _fuzzy_pairs(old, new):
+    """Match typos in old to fixes in new, keeping word order, maximizing the
+    number of plausible (typo, fix) pairs. Unmatched old words are paired with
+    an empty string."""
+
+    if len(old) * len(new) > MAX_FUZZY_REGION:
+        return [(word, '') for word in old]
+
+    rows, cols = len(old), len(new)
+    score = [[0] * (cols + 1) for _ in range(rows + 1)]
+
+    for i in range(rows - 1, -1, -1):
+        for j in range(cols - 1, -1, -1):
+            score[i][j] = max(score[i+1][j], score[i][j+1])
+
+            if is_plausible_fix(old[i], new[j]):
+                score[i][j] = max(score[i][j], score[i+1][j+1] + 1)
+
+    pairs = []
+    i = j = 0
+    while i < rows and j < cols:
+        if (score[i][j] == score[i+1][j+1] + 1
+                and is_plausible_fix(old[i], new[j])):
+            pairs.append((old[i], new[j]))
+            i += 1
+            j += 1
+        elif score[i+1][j] >= score[i][j+1]:
+            pairs.append((old[i], ''))
+            i += 1
+        else:
+            j += 1
+
+    pairs.extend((word, '') for word in old[i:])
+    return pairs
+
+def align_words(old, new):
+    """Align old and new words and return (old, new) pairs of words that may
+    be a typo and its fix.
+
+    Unchanged words are paired with themselves. Changed words are only
+    paired with a close enough word (Damerau-Levenshtein distance): in order
+    when words were replaced one for one, and keeping as many pairs as
+    possible when words were added or removed. Deleted words, and words
+    rewritten into something too different, are paired with an empty
+    string.
+
+    :old: [list] words before changes
+    :new: [list] words after changes
+    :returns: [list] (old, new) pairs, in order"""
+
+    pairs = []
+
+    for tag, i_1, i_2, j_1, j_2 in diff_opcodes(old, new):
+        if tag == 'equal':
+            pairs.extend(zip(old[i_1:i_2], new[j_1:j_2]))
+        elif tag == 'replace' and i_2 - i_1 == j_2 - j_1:
+            pairs.extend((typo, fix if is_plausible_fix(typo, fix) else '')
+                         for typo, fix in zip(old[i_1:i_2], new[j_1:j_2]))
+        elif tag == 'replace':
+            pairs.extend(_fuzzy_pairs(old[i_1:i_2], new[j_1:j_2]))
+        elif tag == 'delete':
+            pairs.extend((word, '') for word in old[i_1:i_2])
+
+    return pairs
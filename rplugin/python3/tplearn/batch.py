@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: batch.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+from tplearn import logger
+
+class RequestBatch(logger.LoggingMixin):
+
+    """Requests to Neovim collected and sent together with nvim_call_atomic,
+    in a single round trip. Used as a context manager, requests are sent when
+    leaving the block."""
+
+    def __init__(self, nvim):
+        self.nvim = nvim
+        self._calls = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def request(self, name, *args):
+        """Add an API request to the batch"""
+        self._calls.append([name, list(args)])
+
+    def command(self, command):
+        """Add an Ex command to the batch"""
+        self.request('nvim_command', command)
+
+    def call(self, function, *args):
+        """Add a Vimscript function call to the batch"""
+        self.request('nvim_call_function', function, list(args))
+
+    def send(self):
+        """Send requests of the batch.
+
+        :returns: [list] results of requests, up to the first one that
+                  failed"""
+
+        calls, self._calls = self._calls, []
+
+        if not calls:
+            return []
+
+        results, error = self.nvim.request('nvim_call_atomic', calls)
+
+        if error:
+            index, _, message = error
+            self.error('Request %s failed: %s (%s)',
+                       calls[index][0], message, calls[index][1])
+
+        return results
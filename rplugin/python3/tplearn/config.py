@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: config.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+from tplearn import logger
+
+class TypitLearnConfig(logger.LoggingMixin):
+
+    """Configuration variables and options, fetched from Neovim in a single
+    request and cached until one of them changes"""
+
+    def __init__(self, nvim):
+        self.nvim = nvim
+        self._values = None
+
+    def __getitem__(self, name):
+        if self._values is None:
+            self._values = self.nvim.call('tplearn#util#config')
+            self.debug('Config: %s', self._values)
+
+        return self._values[name]
+
+    def invalidate(self):
+        """Fetch values again on next access"""
+        self._values = None
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: graph.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+from collections.abc import Mapping
+
+class AbbreviationGraph(Mapping):
+
+    """Abbreviations {typo: fix} with a reverse index {fix: typos}, so that
+    conflicts of a new abbreviation are found without scanning all of them.
+
+    Each typo has a single fix: following fixes from a word walks a single
+    chain, which either ends or loops back (cycle)."""
+
+    # Longest chain followed when looking for cycles
+    MAX_CHAIN = 64
+
+    def __init__(self, abbreviations=None):
+        self._fixes = {}
+        self._typos = {}
+        self.update(abbreviations or {})
+
+    def __getitem__(self, typo):
+        return self._fixes[typo]
+
+    def __iter__(self):
+        return iter(self._fixes)
+
+    def __len__(self):
+        return len(self._fixes)
+
+    def __repr__(self):
+        return f'<AbbreviationGraph {self._fixes!r}>'
+
+    def update(self, abbreviations):
+        """Add or replace abbreviations"""
+
+        for typo, fix in abbreviations.items():
+            self._unindex(typo)
+            self._fixes[typo] = fix
+            self._typos.setdefault(fix, set()).add(typo)
+
+    def pop(self, typo, default=None):
+        """Remove typo and return its fix"""
+
+        self._unindex(typo)
+        return self._fixes.pop(typo, default)
+
+    def typos_of(self, fix):
+        """Return typos expanding to fix"""
+        return frozenset(self._typos.get(fix, ()))
+
+    def chain(self, word):
+        """Return words reached by following fixes from word, word included.
+        The walk stops at the end of the chain or when a word repeats."""
+
+        chain = [word]
+        seen = {word}
+
+        while len(chain) <= self.MAX_CHAIN:
+            word = self._fixes.get(word)
+
+            if word is None:
+                break
+
+            chain.append(word)
+
+            if word in seen:
+                break
+
+            seen.add(word)
+
+        return chain
+
+    def _unindex(self, typo):
+        fix = self._fixes.get(typo)
+
+        if fix is None:
+            return
+
+        typos = self._typos[fix]
+        typos.discard(typo)
+
+        if not typos:
+            del self._typos[fix]
@@ -9,7 +9,7 @@ License: GNU GPL v3
 """
 
 import logging
-from logging.handlers import RotatingFileHandler
+import queue
 
 from os.path import expanduser
 from functools import wraps
@@ -18,20 +18,51 @@ LOGGER = logging.getLogger('typitlearn')
 
 LOG_FORMAT = '%(asctime)s :: %(levelname)-5s :: %(message)s'
 
-def logmethod(func):
-    """Decorator for setting up the logger in LoggingMixin subclasses."""
-    @wraps(func)
-    def wrapper(self, *args, **kwargs):
-        if not self.is_log_enabled:
-            return None
+# Log records waiting to be written, more are dropped
+LOG_QUEUE_SIZE = 10000
 
-        args = list(args)
-        msg = '{parent_class!s}{nvim_id} :: {msg!s}'
-        args[0] = msg.format(nvim_id=f' ({self.nvid})' if self.nvid else '',
-                             parent_class=type(self).__name__,
-                             msg=args[0])
-        return func(self, *args, **kwargs)
-    return wrapper
+def logmethod(level):
+    """Decorator for setting up the logger in LoggingMixin subclasses.
+
+    Nothing is formatted unless level is enabled: messages are prefixed here,
+    and their arguments are only formatted by the handler (pass them as
+    arguments, not as f-strings)."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(self, msg, *args, **kwargs):
+            if not self.is_log_enabled or not self._logger.isEnabledFor(level):
+                return None
+
+            nvim_id = f' ({self.nvid})' if self.nvid else ''
+            msg = f'{type(self).__name__}{nvim_id} :: {msg!s}'
+            return func(self, msg, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+class BoundedQueueHandler(logging.Handler):
+    """Handler putting records in a bounded queue, written to the log file by
+    a QueueListener in a background thread. When the queue is full, records
+    are dropped and counted instead of blocking."""
+
+    def __init__(self, records):
+        super().__init__()
+        self.queue = records
+        self.dropped = 0
+
+    def emit(self, record):
+        # Format arguments now, they may change before the record is written
+        record.msg = record.getMessage()
+        record.args = None
+
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
 
 
 class LoggingMixin:
@@ -39,6 +70,8 @@ class LoggingMixin:
     is_log_enabled = False
     nvid = None
     _logger = LOGGER
+    _log_listener = None
+    _log_handler = None
 
     def _setup_log(self, log_file, log_level, nvim_id):
 
@@ -50,30 +83,68 @@ class LoggingMixin:
         except TypeError:
             return
 
+        # Only import handlers (and their dependencies) when logging is on
+        from logging.handlers import QueueListener, RotatingFileHandler
+
         formatter = logging.Formatter(LOG_FORMAT)
         file_handler = RotatingFileHandler(log_file, 'a', 1000000, 1)
 
         file_handler.setLevel(logging.DEBUG)
         file_handler.setFormatter(formatter)
-        self._logger.addHandler(file_handler)
+
+        # The file is written from a background thread, so that logging
+        # never blocks the event loop of the plugin host
+        queue_handler = BoundedQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+        listener = QueueListener(queue_handler.queue, file_handler,
+                                 respect_handler_level=True)
+        listener.start()
+
+        self._logger.addHandler(queue_handler)
+        LoggingMixin._log_listener = listener
+        LoggingMixin._log_handler = queue_handler
         LoggingMixin.is_log_enabled = True
         LoggingMixin.nvid = nvim_id
 
-        self.info(f'Initialize for {nvim_id}')
+        self.info('Initialize for %s', nvim_id)
+
+    def _flush_log(self):
+        """Write queued log records, then stop logging"""
+
+        listener = LoggingMixin._log_listener
+
+        if listener is None:
+            return
+
+        queue_handler = LoggingMixin._log_handler
+
+        # Wait for queued records to be written: the queue must have room
+        # for the warning below, and for the listener to be stopped
+        queue_handler.queue.join()
+
+        if queue_handler.dropped:
+            self.warning('Dropped %s log messages', queue_handler.dropped)
+
+        LoggingMixin.is_log_enabled = False
+        LoggingMixin._log_listener = LoggingMixin._log_handler = None
+        self._logger.removeHandler(queue_handler)
+        listener.stop()
+
+        for handler in listener.handlers:
+            handler.close()
 
-    @logmethod
+    @logmethod(logging.DEBUG)
     def debug(self, msg, *args, **kwargs):
         self._logger.debug(msg, *args, **kwargs)
 
-    @logmethod
+    @logmethod(logging.INFO)
     def info(self, msg, *args, **kwargs):
         self._logger.info(msg, *args, **kwargs)
 
-    @logmethod
+    @logmethod(logging.WARNING)
     def warning(self, msg, *args, **kwargs):
         self._logger.warning(msg, *args, **kwargs)
     warn = warning
 
-    @logmethod
+    @logmethod(logging.ERROR)
     def error(self, msg, *args, **kwargs):
         self._logger.error(msg, *args, **kwargs)
@@ -8,10 +8,27 @@ License: GNU GPL v3
 """
 
 import os
-import copy
-import platform
+import re
+import sys
+
+from bisect import bisect_right
+from itertools import accumulate
 
 from tplearn import logger
+from tplearn.batch import RequestBatch
+from tplearn.config import TypitLearnConfig
+from tplearn.graph import AbbreviationGraph
+from tplearn.stats import STATS
+from tplearn.store import AbbreviationFile
+
+# Number of lines fixed at once when fixing typos in the background
+FIX_CHUNK_SIZE = 10000
+
+REVIEW_HEADER = [
+    '" TypitLearn: these fixes need a review. Delete (or edit) them, then',
+    '" :write to save the fixes that are left.',
+]
+REVIEW_LINE_RE = re.compile(r'^\s*(\S+)\s+=>\s+(\S+)\s*$')
 
 class TypitLearnManager(logger.LoggingMixin):
 
@@ -19,20 +36,29 @@ class TypitLearnManager(logger.LoggingMixin):
 
     def __init__(self, nvim):
         self.nvim = nvim
-        self._all_abbrev = self._tplearn_abbrev = {}
+        self.config = TypitLearnConfig(nvim)
+        self._tplearn_abbrev = {}
+        self._all_abbrev = AbbreviationGraph()
         self._last_abbrev = []
+        self._to_source = []
+        self._defined = False
+        self._other_abbrev = None
+        self._signature = None
+        self._spelling = {}
+        self._spelllang = None
+        self._flagged = {}
 
     def _get_tpdir(self):
-        tpdir = self.nvim.eval('g:tplearn_dir')
+        tpdir = self.config['dir']
 
         if tpdir == '':
-            home = self.nvim.eval('$HOME')
+            home = self.config['home']
 
-            if platform.system() == 'Windows':
+            if sys.platform == 'win32':
                 tpdir = os.path.join(home, 'vimfiles', 'typitlearn')
 
-            if self.nvim.eval("has('nvim')") == 1:
-                xdg_config = self.nvim.eval('$XDG_CONFIG_HOME') or os.path.join(home, '.config')
+            if self.config['has_nvim'] == 1:
+                xdg_config = self.config['xdg_config_home'] or os.path.join(home, '.config')
                 tpdir = os.path.join(xdg_config, 'nvim', 'typitlearn')
 
         tpdir = os.path.expanduser(tpdir)
@@ -57,68 +83,129 @@ class TypitLearnManager(logger.LoggingMixin):
 
         to_load = []
         for filename in files:
-            if 'all.vim' in filename:
+            if 'all.vim' in filename and not filename.endswith('.tmp'):
                 filepath = os.path.join(tpdir, filename)
                 to_load.append(filepath)
 
         return to_load
 
-    def load_abbreviations(self):
-        """Source TypitLearn abbreviation files"""
+    @STATS.timed
+    def load_abbreviations(self, lazy=False):
+        """Load TypitLearn abbreviation files. When lazy, abbreviations are
+        only read: they are defined in Neovim by define_abbreviations."""
         files = self._get_files_to_load()
-        self._all_abbrev = {}
-        self._tplearn_abbrev = {}
-        self.nvim.vars['tplearn_abbrev'] = {}
+        abbrev_tpl = {}
+        self._to_source = []
+        self._defined = False
+        self._signature = self._files_signature(files)
 
-        if files:
-            for abbrev_file in files:
-                self.info(f'Loading {abbrev_file!r}')
-                self.nvim.command(f'silent source {abbrev_file}')
+        for abbrev_file in files or []:
+            self.info('Loading %r', abbrev_file)
+            abbreviations = AbbreviationFile(abbrev_file).read()
 
-        abbrev_other = self._parse_nvim_abbrev('iabbrev')
-        abbrev_tpl = self.nvim.eval('g:tplearn_abbrev')
+            if abbreviations is None:
+                self._to_source.append(abbrev_file)
+            else:
+                abbrev_tpl.update(abbreviations)
+
+        self._tplearn_abbrev = dict(abbrev_tpl)
+        self._all_abbrev = AbbreviationGraph(abbrev_tpl)
 
-        self._tplearn_abbrev.update(abbrev_tpl)
-        self._all_abbrev.update(abbrev_other)
-        self._all_abbrev.update(abbrev_tpl)
+        if not lazy:
+            self.define_abbreviations()
 
-        self.debug(f'TPLearn abbrev: {self._tplearn_abbrev}')
-        self.debug(f'Other abbrev: {abbrev_other!r}')
         self.nvim.command('call tplearn#util#notify("reload")')
 
+    def define_abbreviations(self):
+        """Define loaded abbreviations in Neovim, if not done already"""
+
+        if self._defined:
+            return
+
+        self._defined = True
+
+        with RequestBatch(self.nvim) as batch:
+            self._define_abbreviations(batch, self._tplearn_abbrev)
+
+        # Files with other Vimscript commands are sourced like before
+        for abbrev_file in self._to_source:
+            self.info('Sourcing %r', abbrev_file)
+            self.nvim.command(f'silent source {abbrev_file}')
+
+        if self._to_source:
+            self._tplearn_abbrev.update(self.nvim.eval('g:tplearn_abbrev'))
+            self.invalidate_other_abbreviations()
+
+        abbrev_other = self._other_abbreviations()
+
+        self._all_abbrev = AbbreviationGraph(abbrev_other)
+        self._all_abbrev.update(self._tplearn_abbrev)
+
+        self.debug('TPLearn abbrev: %s', self._tplearn_abbrev)
+        self.debug('Other abbrev: %r', abbrev_other)
+
+    def _define_abbreviations(self, batch, added=None, removed=()):
+        """Add requests to batch defining added abbreviations, removing
+        removed ones and setting g:tplearn_abbrev"""
+
+        if self.config['undo']:
+            command = ('silent! iabbrev {0} {0} <c-g>u<c-o>'
+                       ':call tplearn#util#ciw("{1}")<cr>')
+        else:
+            command = 'silent! iabbrev {0} {1}'
+
+        batch.request('nvim_set_var', 'tplearn_abbrev', self._tplearn_abbrev)
+
+        for typo in removed:
+            batch.command(f'silent! iunabbrev {typo}')
+
+        for typo, fix in (added or {}).items():
+            batch.command(command.format(typo, fix))
+
+    def _files_signature(self, files=None):
+        """Modification times and sizes of abbreviation files, to detect
+        changes made outside of this instance"""
+
+        files = self._get_files_to_load() if files is None else files
+        signature = []
+
+        for filepath in files or []:
+            try:
+                stat_result = os.stat(filepath)
+            except OSError:
+                continue
+
+            signature.append((filepath, stat_result.st_mtime_ns,
+                              stat_result.st_size))
+
+        return sorted(signature)
+
+    def reload_if_changed(self):
+        """Reload abbreviations if files changed since they were loaded"""
+
+        if self._files_signature() == self._signature:
+            return False
+
+        self.info('Abbreviation files changed, reload them')
+        self.load_abbreviations()
+        return True
+
     def _get_file_to_edit(self):
         tpdir = self._get_tpdir()
         tpfile = os.path.join(tpdir, 'all.vim')
 
         return tpfile
 
-    def _prompt(self, msg='', options=None, default=''):
-        option = '\n'.join(['&' + o for o in options])
-        default = options.index(default)+1
-
-        command = 'let g:tplearn_prompt = confirm("{}", "{}", {})'
-        command = command.format(msg, option, default)
-        self.nvim.command('call tplearn#util#notify("ask")')
-        self.nvim.command(command)
-
-        prompt = self.nvim.eval('g:tplearn_prompt')
-        return options[prompt-1]
-
     def _rm_existing_fixes(self, abb=None):
         """Removes existing {typo: fix} items from abbreviation dict"""
 
-        old_typos = self._all_abbrev.keys()
-        filtered = {}
-
-        for typo, fix in abb.items():
-            if not (typo in old_typos and fix == self._all_abbrev[typo]):
-                filtered.update({typo: fix})
-
-        return filtered
+        return {typo: fix for typo, fix in abb.items()
+                if self._all_abbrev.get(typo) != fix}
 
     def _check_redundancies(self, typo=None, fix=None):
-        """Check abbreviation for redundancies (already used typo, fix already
-        exists as a typo).
+        """Check abbreviation for redundancies (already used typo, cycle of
+        abbreviations, fix already exists as a typo, typo already exists as
+        a fix). Only abbreviations chained to typo or fix are looked at.
 
         :typo: (str)
         :fix: (str)
@@ -128,43 +215,83 @@ class TypitLearnManager(logger.LoggingMixin):
         if not typo or not fix:
             return None
 
-        old_typos = self._all_abbrev.keys()
+        graph = self._all_abbrev
 
-        if typo in old_typos:
-            existing = self._all_abbrev[typo]
-            message = '\\"{}\\" already expands to \\"{}\\". Expand to \\"{}\\" instead?'
-            message = message.format(typo, existing, fix)
-        elif fix in old_typos:
-            existing = self._all_abbrev[fix]
-            message = '\\"{}\\" expands to \\"{}\\". Use as a fix of \\"{}\\" instead?'
-            message = message.format(fix, existing, typo)
-        else:
-            return None
+        if typo in graph:
+            message = '"{}" already expands to "{}". Expand to "{}" instead?'
+            return message.format(typo, graph[typo], fix)
+
+        chain = graph.chain(fix)
+
+        if typo in chain:
+            chain = ' => '.join(f'"{word}"' for word in [typo, *chain])
+            return f'{chain} would be a cycle. Expand "{typo}" anyway?'
+
+        if fix in graph:
+            message = '"{}" expands to "{}". Use as a fix of "{}" instead?'
+            return message.format(fix, graph[fix], typo)
+
+        fixed = sorted(graph.typos_of(typo))
+
+        if fixed:
+            fixed = ', '.join(f'"{word}"' for word in fixed)
+            message = '"{}" is the fix of {}. Use it as a typo of "{}" instead?'
+            return message.format(typo, fixed, fix)
+
+        return None
+
+    def _spell_verdicts(self, typos):
+        """Return spelling verdicts of typos ('bad', 'rare', 'caps', 'local'
+        or '' for valid words). Verdicts depend on 'spelllang' and spell files
+        of the current buffer, which Neovim returns with each check: they are
+        memoized for each 'spelllang' until words are added to its spell
+        files (zg, zw).
+
+        :typos: [iterable] words to check
+        :returns: [dict] verdict of each word"""
+
+        typos = set(typos)
+        _, verdicts = self._spelling.get(self._spelllang, (None, {}))
+        unknown = [typo for typo in typos if typo not in verdicts]
+
+        self.debug('Spellcheck %s words', len(unknown))
+        checked = self.nvim.call('tplearn#util#spellcheck', unknown)
+        self._spelllang = checked['spelllang']
+        signature = self._files_signature(checked['spellfile'])
 
-        return message
+        if self._spelling.get(self._spelllang, (None,))[0] != signature:
+            self._spelling[self._spelllang] = (signature, {})
 
-    def _check_spelling(self, typo=None, fix=None):
+        verdicts = self._spelling[self._spelllang][1]
+        verdicts.update(zip(unknown, checked['verdicts']))
+
+        # Only when the buffer or its spell files changed since last check
+        unknown = [typo for typo in typos if typo not in verdicts]
+
+        if unknown:
+            self.debug('Spellcheck %s more words', len(unknown))
+            checked = self.nvim.call('tplearn#util#spellcheck', unknown)
+            verdicts.update(zip(unknown, checked['verdicts']))
+
+        return verdicts
+
+    def _check_spelling(self, typo=None, fix=None, verdict='bad'):
         """Check if typo is valid word.
 
         :typo: (str)
         :fix: (str)
+        :verdict: (str) spelling verdict of typo, from _spell_verdicts
         :returns: None if no redundancy, string with error message otherwise
         """
 
-        if not typo or not self.nvim.eval('g:tplearn_spellcheck'):
-            self.debug('yolo')
+        if not typo or verdict == 'bad':
             return None
 
-        spchk = self.nvim.funcs.spellbadword(typo)
-
-        if spchk[1] == 'bad':
-            return None
-
-        if spchk[1] == 'rare':
+        if verdict == 'rare':
             diagnostic = 'valid (but rare)'
-        elif spchk[1] == 'caps':
+        elif verdict == 'caps':
             diagnostic = 'valid (if capitalized)'
-        elif spchk[1] == 'local':
+        elif verdict == 'local':
             diagnostic = 'valid (although only locally)'
         else:
             diagnostic = 'valid'
@@ -175,9 +302,15 @@ class TypitLearnManager(logger.LoggingMixin):
 
     def _check_abbreviations(self, abb=None):
         messages = {}
+
+        # Check all typos at once
+        verdicts = (self._spell_verdicts(abb.keys())
+                    if self.config['spellcheck'] else {})
+
         for typo, fix in abb.items():
             redundancy = self._check_redundancies(typo, fix)
-            spellcheck = self._check_spelling(typo, fix)
+            spellcheck = self._check_spelling(typo, fix,
+                                              verdicts.get(typo, 'bad'))
 
             if redundancy:
                 messages.update({redundancy: typo})
@@ -185,67 +318,113 @@ class TypitLearnManager(logger.LoggingMixin):
             if spellcheck:
                 messages.update({spellcheck: typo})
 
-        self.debug(f'Checking abbreviations: {messages!r}')
+        self.debug('Checking abbreviations: %r', messages)
         return messages
 
     def _process_abbreviations(self, abb=None):
+        """Split abbreviations between ones that can be saved right away and
+        flagged ones, which need a review.
+
+        :returns: [tuple] ({typo: fix} to save, {typo: (fix, reasons)})"""
+
         abb = self._rm_existing_fixes(abb)
-        filtered = copy.deepcopy(abb)
-        messages = self._check_abbreviations(abb)
-
-        for message, typo in messages.items():
-            prompt = self._prompt(message, ['Yes', 'No', 'Abort'], 'No')
-            self.info(f'User answered {prompt!r}')
-
-            if prompt == 'Abort':
-                filtered = {}
-                break
-            elif prompt == 'No':
-                filtered.pop(typo)
-            else:
-                continue
+        reasons = {}
 
-        return filtered
+        for message, typo in self._check_abbreviations(abb).items():
+            reasons.setdefault(typo, []).append(message)
 
-    def _write_abbreviations(self, abbreviations=None):
-        """Write abbreviations to file"""
+        accepted = {typo: fix for typo, fix in abb.items()
+                    if typo not in reasons}
+        flagged = {typo: (abb[typo], reasons[typo]) for typo in reasons}
+
+        return accepted, flagged
+
+    def _write_abbreviations(self, abbreviations=None, compact=False):
+        """Write abbreviations to file: new abbreviations are appended, the
+        whole file is rewritten when compact is set or when enough
+        abbreviations were appended since last time"""
 
         if not abbreviations:
             return
 
-        filepath = self._get_file_to_edit()
-        function = 'call tplearn#util#abbreviate("{}", "{}")\n'
-        content = letter = ''
-
-        for typo in sorted(self._tplearn_abbrev.keys(),
-                           key=lambda k: k.lower()):
-            if letter < typo[0].lower():
-                content += '\n' if letter else ''
-                letter = typo[0].lower()
-                content += f'" {letter}\n'
+        tpfile = AbbreviationFile(self._get_file_to_edit())
 
-            fix = self._tplearn_abbrev[typo]
-            content += function.format(typo, fix)
+        if compact or tpfile.needs_compaction():
+            tpfile.compact(self._tplearn_abbrev)
+        else:
+            tpfile.append(abbreviations)
 
-        content = content.encode('utf-8', 'surrogateescape')
-        content = content.decode('utf-8', 'replace')
+    @STATS.timed
+    def save_abbreviations(self, abbreviations=None):
+        """Save abbreviations. Flagged ones are kept aside until they are
+        reviewed (see review_flagged)."""
 
-        with open(filepath, 'w+') as tpfile:
-            self.info('Write %s abbreviations to %s',
-                      len(abbreviations), filepath)
-            tpfile.write(content)
+        self.reload_if_changed()
+        new_abbrev, flagged = self._process_abbreviations(abbreviations)
+        self._flagged.update(flagged)
 
-    def save_abbreviations(self, abbreviations=None):
-        """Save abbreviations"""
+        return self._save_abbreviations(new_abbrev)
 
-        self.load_abbreviations()
-        new_abbrev = self._process_abbreviations(abbreviations)
+    def _save_abbreviations(self, new_abbrev):
         self._tplearn_abbrev.update(new_abbrev)
+        self._all_abbrev.update(new_abbrev)
         self._last_abbrev.append(new_abbrev)
         self._write_abbreviations(new_abbrev)
+        self._signature = self._files_signature()
+
+        if new_abbrev and self._defined:
+            with RequestBatch(self.nvim) as batch:
+                self._define_abbreviations(batch, added=new_abbrev)
 
         return new_abbrev
 
+    def review_flagged(self):
+        """Open a review buffer listing all flagged abbreviations and why
+        they were flagged, if there are any"""
+
+        if not self._flagged:
+            return False
+
+        lines = list(REVIEW_HEADER)
+
+        for typo, (fix, reasons) in self._flagged.items():
+            lines.append('')
+            lines.extend(f'" {reason}' for reason in reasons)
+            lines.append(f'{typo} => {fix}')
+
+        with RequestBatch(self.nvim) as batch:
+            batch.call('tplearn#util#review', lines)
+            batch.command('call tplearn#util#notify("review")')
+
+        return True
+
+    def save_reviewed(self, lines):
+        """Save flagged abbreviations kept in the review buffer.
+
+        :lines: [list] lines of the review buffer
+        :returns: [dict] saved abbreviations, or None if nothing was waiting
+                  for a review"""
+
+        if not self._flagged:
+            return None
+
+        reviewed = {}
+        for line in lines:
+            match = REVIEW_LINE_RE.match(line)
+
+            if match and match.group(1) in self._flagged:
+                reviewed[match.group(1)] = match.group(2)
+
+        self.info('Reviewed %s of %s flagged abbreviations',
+                  len(reviewed), len(self._flagged))
+        self._flagged = {}
+
+        if not reviewed:
+            return reviewed
+
+        self.reload_if_changed()
+        return self._save_abbreviations(reviewed)
+
     def rm_last_abbrevs(self):
         """Remove abbreviations from variables and file"""
 
@@ -256,26 +435,34 @@ class TypitLearnManager(logger.LoggingMixin):
             self.nvim.command('call tplearn#util#notify("undo")')
             return
 
+        self.reload_if_changed()
+
         for typo in last.keys():
-            self._tplearn_abbrev.pop(typo)
-            self._all_abbrev.pop(typo)
-            self.nvim.command(f'unabbreviate {typo}')
+            self._tplearn_abbrev.pop(typo, None)
+            self._all_abbrev.pop(typo, None)
 
-        self._write_abbreviations(last)
-        self.load_abbreviations()
-        self.show_abbrevs(last, 'Deleted:')
-        self.nvim.command('call tplearn#util#notify("undo")')
+        self._write_abbreviations(last, compact=True)
+        self._signature = self._files_signature()
+        self.invalidate_other_abbreviations()
+
+        with RequestBatch(self.nvim) as batch:
+            self._define_abbreviations(batch, removed=last.keys())
+            batch.call('tplearn#util#message',
+                       self.format_abbrevs(last, 'Deleted:'))
+            batch.command('call tplearn#util#notify("undo")')
 
-    def _parse_nvim_abbrev(self, command):
-        output = self.nvim.command_output(command)
-        output = output.split('\n')
-        output = [l for l in output if ('tplearn#' not in l) and (l != '')]
-        output = [l.replace('*', '') for l in output]
-        output = [s for l in output for s in l.split()]
-        typos = [output[i] for i in range(1, len(output), 3)]
-        fixes = [output[i] for i in range(2, len(output), 3)]
+    def _other_abbreviations(self):
+        """Return abbreviations not defined by TypitLearn, only fetched from
+        Neovim again after invalidate_other_abbreviations"""
 
-        return dict(zip(typos, fixes))
+        if self._other_abbrev is None:
+            self._other_abbrev = self.nvim.call('tplearn#util#abbreviations')
+
+        return self._other_abbrev
+
+    def invalidate_other_abbreviations(self):
+        """Forget cached abbreviations not defined by TypitLearn"""
+        self._other_abbrev = None
 
     def edit_file(self):
         """Open abbreviation file"""
@@ -283,33 +470,226 @@ class TypitLearnManager(logger.LoggingMixin):
         filepath = self._get_file_to_edit()
         self.nvim.command('vsplit {}'.format(filepath))
 
-    def fix_typos(self, abbreviations=None):
-        """Search and replace all abbreviations"""
+    @STATS.timed
+    def fix_typos(self, abbreviations=None, all_buffers=False, buf=None):
+        """Search and replace all abbreviations in buf (the current buffer by
+        default), then in the background in other listed buffers if
+        all_buffers is set"""
         if not abbreviations:
             return
 
-        for typo, fix in abbreviations.items():
-            self.info('Replace %s by %s in buffer', typo, fix)
-            self.nvim.command('%s/\<{}\>/{}/ge'.format(typo, fix))
-            self.nvim.command('nohl')
+        self.info('Replace %s typos in buffer', len(abbreviations))
 
-    def show_abbrevs(self, abbreviations=None, text=None):
-        """Display abbreviations in Neovim message"""
+        buf = buf if buf is not None else self.nvim.current.buffer
+        self._set_lines(buf, self._fixed_lines(buf[:], abbreviations))
+
+        if all_buffers:
+            bufnrs = [info['bufnr'] for info
+                      in self.nvim.call('getbufinfo', {'buflisted': 1})
+                      if info['loaded'] and info['bufnr'] != buf.number]
+            self._run_in_background(self._fix_buffers(bufnrs, abbreviations))
+
+    def fix_files(self, directory, abbreviations=None):
+        """Search and replace abbreviations (last recorded ones by default) in
+        the background in files of directory that are not loaded in a
+        buffer"""
+
+        if abbreviations is None:
+            abbreviations = self._last_abbrev[-1] if self._last_abbrev else {}
 
         if not abbreviations:
-            self.nvim.call('tplearn#util#message', f'{text} no fixes')
+            self.nvim.call('tplearn#util#message', 'No fixes to apply.')
             return
 
-        msg = ''
-        for i, (typo, fix) in enumerate(abbreviations.items()):
-            if i == 0:
-                fmt = '"{}" => "{}"'
+        loaded = {os.path.realpath(info['name']) for info
+                  in self.nvim.call('getbufinfo', {'bufloaded': 1})
+                  if info['name']}
+        directory = os.path.expanduser(directory)
+        self._run_in_background(self._fix_files(directory, abbreviations,
+                                                loaded))
+
+    def _run_in_background(self, work):
+        """Run generator work one step at a time, letting the plugin host
+        process other events between steps"""
+
+        def step():
+            try:
+                next(work)
+            except StopIteration:
+                return
+
+            self.nvim.async_call(step)
+
+        self.nvim.async_call(step)
+
+    def _fix_buffers(self, bufnrs, abbreviations):
+        for num, bufnr in enumerate(bufnrs, 1):
+            try:
+                buf = self.nvim.buffers[bufnr]
+            except KeyError:
+                self.info('Buffer %s was wiped, skip it', bufnr)
+                continue
+
+            tick = self.nvim.request('nvim_buf_get_changedtick', buf)
+            count = self.nvim.request('nvim_buf_line_count', buf)
+            runs = []
+
+            for start in range(0, count, FIX_CHUNK_SIZE):
+                lines = buf[start:start+FIX_CHUNK_SIZE]
+                runs.extend((first + start, last + start, fixed)
+                            for first, last, fixed
+                            in self._fixed_lines(lines, abbreviations))
+                yield
+
+                # Buffers can be wiped between steps
+                if not buf.valid:
+                    self.info('Buffer %s was wiped while fixing typos, '
+                              'skip it', bufnr)
+                    break
+            else:
+                if tick != self.nvim.request('nvim_buf_get_changedtick', buf):
+                    self.info('Buffer %s changed while fixing typos, skip it',
+                              bufnr)
+                else:
+                    self._set_lines(buf, runs)
+
+            self.nvim.call('tplearn#util#status',
+                           f'Fixed typos in {num}/{len(bufnrs)} buffers',
+                           async_=True)
+            yield
+
+    def _fix_files(self, directory, abbreviations, loaded):
+        # Files are fixed while walking, so that large trees don't block
+        fixed_files = checked_files = 0
+
+        for root, dirs, files in os.walk(directory):
+            dirs[:] = [d for d in dirs if not d.startswith('.')]
+
+            for name in files:
+                if name.startswith('.'):
+                    continue
+
+                path = os.path.join(root, name)
+                checked_files += 1
+
+                if os.path.realpath(path) not in loaded:
+                    fixed_files += self._fix_file(path, abbreviations)
+
+                self.nvim.call('tplearn#util#status',
+                               f'Fixed typos in {fixed_files} files '
+                               f'({checked_files} checked)', async_=True)
+                yield
+
+            yield
+
+    def _fix_file(self, path, abbreviations):
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as text_file:
+                lines = text_file.read().split('\n')
+        except (OSError, UnicodeDecodeError):
+            return False
+
+        runs = self._fixed_lines(lines, abbreviations)
+
+        if not runs:
+            return False
+
+        for first, last, fixed in runs:
+            lines[first:last] = fixed
+
+        # Only needed when fixing files, keep plugin imports cheap
+        import shutil
+
+        self.info('Fix typos in %s', path)
+
+        # Replace the target of symlinks, not the links themselves
+        path = os.path.realpath(path)
+        tmp_path = f'{path}.tplearn'
+
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as tmp_file:
+                tmp_file.write('\n'.join(lines))
+
+            shutil.copymode(path, tmp_path)
+            os.replace(tmp_path, path)
+        except OSError as error:
+            self.error('Could not fix typos in %s: %s', path, error)
+            return False
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        return True
+
+    def _set_lines(self, buf, runs):
+        """Replace runs of lines in buf at once, so that they are undone
+        together"""
+
+        with RequestBatch(self.nvim) as batch:
+            for first, last, lines in runs:
+                batch.request('nvim_buf_set_lines', buf, first, last, True,
+                              lines)
+
+    @staticmethod
+    def _fixed_lines(lines, abbreviations):
+        """Replace typos in lines.
+
+        :lines: [list] lines to fix
+        :abbreviations: [dict] typos and their fixes
+        :returns: [list] (start, end, fixed lines) for each run of consecutive
+                  changed lines"""
+
+        # Find lines containing typos with plain substring searches over the
+        # whole text, then only run the regex on these lines.
+        text = '\n'.join(lines)
+        starts = [0, *accumulate(len(line) + 1 for line in lines)]
+        candidates = set()
+
+        for typo in abbreviations:
+            pos = text.find(typo)
+            while pos != -1:
+                num = bisect_right(starts, pos) - 1
+                candidates.add(num)
+                pos = text.find(typo, starts[num + 1])
+
+        typos = sorted(abbreviations, key=len, reverse=True)
+        typos_re = re.compile(r'\b(?:{})\b'.format('|'.join(map(re.escape, typos))))
+
+        def fix(match):
+            return abbreviations[match.group()]
+
+        runs = []
+        for num in sorted(candidates):
+            fixed, count = typos_re.subn(fix, lines[num])
+
+            if not count:
+                continue
+
+            if runs and runs[-1][1] == num:
+                runs[-1][1] = num + 1
+                runs[-1][2].append(fixed)
             else:
-                fmt = ', "{}" => "{}"'
+                runs.append([num, num + 1, [fixed]])
 
-            msg += fmt.format(typo, fix)
+        return [tuple(run) for run in runs]
+
+    def show_abbrevs(self, abbreviations=None, text=None):
+        """Display abbreviations in Neovim message"""
+
+        self.nvim.call('tplearn#util#message',
+                       self.format_abbrevs(abbreviations, text))
+
+    @staticmethod
+    def format_abbrevs(abbreviations=None, text=None):
+        """Format abbreviations as a message"""
+
+        if not abbreviations:
+            return f'{text} no fixes'
+
+        msg = ', '.join(f'"{typo}" => "{fix}"'
+                        for typo, fix in abbreviations.items())
 
         if text:
             msg = '{} {}'.format(text, msg)
 
-        self.nvim.call('tplearn#util#message', msg)
+        return msg
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: shadow.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+
+class ShadowBuffer:
+
+    """Copy of the lines of a Neovim buffer, stored as a gap buffer so that
+    splices around the cursor only move the changed lines."""
+
+    __slots__ = ('_lines', '_gap_start', '_gap_end')
+
+    MIN_GAP = 64
+
+    def __init__(self, lines=()):
+        self._lines = list(lines)
+        self._gap_start = self._gap_end = len(self._lines)
+        self._grow(self.MIN_GAP)
+
+    def __len__(self):
+        return len(self._lines) - (self._gap_end - self._gap_start)
+
+    def __getitem__(self, idx):
+        return self._lines[self._position(idx)]
+
+    def __setitem__(self, idx, line):
+        self._lines[self._position(idx)] = line
+
+    def __iter__(self):
+        yield from self._lines[:self._gap_start]
+        yield from self._lines[self._gap_end:]
+
+    def __repr__(self):
+        return f'<ShadowBuffer ({len(self)} lines)>'
+
+    def lines(self, first, last):
+        """Return lines first to last (exclusive)"""
+
+        last = min(last, len(self))
+        return [self[i] for i in range(first, last)]
+
+    def splice(self, first, last, lines):
+        """Replace lines first to last (exclusive) by lines, with the same
+        semantics as nvim_buf_lines_event.
+
+        :first: [int] first line of changes
+        :last: [int] last line of changes (exclusive)
+        :lines: [list] replacement lines"""
+
+        last = min(last, len(self))
+        first = min(first, last)
+
+        self._move_gap(last)
+
+        # Deleted lines become part of the gap
+        self._clear(first, self._gap_start)
+        self._gap_start = first
+
+        if len(lines) > self._gap_end - self._gap_start:
+            self._grow(len(lines))
+
+        end = self._gap_start + len(lines)
+        self._lines[self._gap_start:end] = lines
+        self._gap_start = end
+
+    def _position(self, idx):
+        """Position of line idx in the underlying list"""
+
+        size = len(self)
+
+        if idx < 0:
+            idx += size
+
+        if not 0 <= idx < size:
+            raise IndexError('ShadowBuffer index out of range')
+
+        if idx >= self._gap_start:
+            idx += self._gap_end - self._gap_start
+
+        return idx
+
+    def _move_gap(self, pos):
+        gap_start, gap_end = self._gap_start, self._gap_end
+
+        if pos < gap_start:
+            moved = gap_start - pos
+            self._lines[gap_end-moved:gap_end] = self._lines[pos:gap_start]
+            self._clear(pos, min(gap_start, gap_end - moved))
+            self._gap_start, self._gap_end = pos, gap_end - moved
+        elif pos > gap_start:
+            moved = pos - gap_start
+            self._lines[gap_start:pos] = self._lines[gap_end:gap_end+moved]
+            self._clear(max(gap_end, pos), gap_end + moved)
+            self._gap_start, self._gap_end = pos, gap_end + moved
+
+    def _clear(self, start, end):
+        """Drop references to lines that are now part of the gap"""
+        if start < end:
+            self._lines[start:end] = [None] * (end - start)
+
+    def _grow(self, needed):
+        size = max(needed, self.MIN_GAP, len(self) // 8)
+        self._lines[self._gap_end:self._gap_end] = [None] * size
+        self._gap_end += size
@@ -0,0 +1,164 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: stats.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import json
+import time
+
+from bisect import bisect_left
+from collections import Counter
+from functools import wraps
+
+# Upper bounds (ms) of histogram buckets, the last bucket has no bound
+BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class Timing:
+
+    """Calls, durations and RPC round trips of an instrumented method"""
+
+    __slots__ = ('calls', 'total', 'max', 'rpcs', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rpcs = 0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    def add(self, duration):
+        """Record a call that took duration (ms)"""
+
+        self.calls += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        self.buckets[bisect_left(BUCKETS, duration)] += 1
+
+    def as_dict(self):
+        return {'calls': self.calls,
+                'total_ms': self.total,
+                'mean_ms': self.total / self.calls if self.calls else 0,
+                'max_ms': self.max,
+                'rpcs': self.rpcs,
+                'buckets': dict(zip([*map(str, BUCKETS), 'inf'],
+                                    self.buckets))}
+
+
+class Stats:
+
+    """Timings of instrumented methods and counts of requests to Neovim.
+    Disabled by default: instrumented methods then only check a flag."""
+
+    def __init__(self):
+        self.enabled = False
+        self.timings = {}
+        self.counters = Counter()
+        self._running = []
+        self._session = None
+        self._request = None
+
+    def enable(self, session=None):
+        """Start recording. Requests sent through session (an object with a
+        request method, like the pynvim session) are counted."""
+
+        if self.enabled:
+            return
+
+        self.enabled = True
+
+        if session is not None:
+            self._session = session
+            self._request = session.request
+            session.request = self._counted_request
+
+    def disable(self):
+        """Stop recording, recorded values are kept"""
+
+        if self._session is not None:
+            self._session.request = self._request
+            self._session = self._request = None
+
+        self.enabled = False
+        self._running = []
+
+    def reset(self):
+        """Forget recorded values"""
+        self.timings = {}
+        self.counters = Counter()
+
+    def timed(self, func):
+        """Decorator recording calls of func when enabled"""
+
+        name = func.__qualname__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return func(*args, **kwargs)
+
+            timing = self.timings.get(name)
+
+            if timing is None:
+                timing = self.timings[name] = Timing()
+
+            self._running.append(timing)
+            start = time.perf_counter()
+
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timing.add((time.perf_counter() - start) * 1000)
+                self._running.remove(timing)
+
+        return wrapper
+
+    def _counted_request(self, name, *args, **kwargs):
+        if kwargs.get('async_'):
+            self.counters['notifications'] += 1
+        else:
+            self.counters['requests'] += 1
+
+            for timing in set(self._running):
+                timing.rpcs += 1
+
+        self.counters[name] += 1
+        return self._request(name, *args, **kwargs)
+
+    def as_dict(self):
+        return {'enabled': self.enabled,
+                'timings': {name: timing.as_dict()
+                            for name, timing in sorted(self.timings.items())},
+                'counters': dict(self.counters)}
+
+    def dump(self, path):
+        """Write recorded values to path as JSON"""
+
+        with open(path, 'w', encoding='utf-8') as json_file:
+            json.dump(self.as_dict(), json_file, indent=2)
+
+    def report(self):
+        """Return recorded values as lines of text"""
+
+        lines = ['TypitLearn stats ({})'.format('on' if self.enabled
+                                                else 'off')]
+        lines.append('{:<45} {:>7} {:>9} {:>9} {:>6}'.format(
+            'method', 'calls', 'mean ms', 'max ms', 'rpcs'))
+
+        for name, timing in sorted(self.timings.items()):
+            values = timing.as_dict()
+            lines.append('{:<45} {:>7} {:>9.3f} {:>9.3f} {:>6}'.format(
+                name, values['calls'], values['mean_ms'], values['max_ms'],
+                values['rpcs']))
+
+        lines.append('requests: {}, notifications: {}'.format(
+            self.counters['requests'], self.counters['notifications']))
+
+        return lines
+
+
+STATS = Stats()
@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: status.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import time
+
+from tplearn import logger
+from tplearn.manager import TypitLearnManager
+
+class StatusUpdater(logger.LoggingMixin):
+
+    """Display recorded abbreviations while recording. Updates are coalesced
+    so that Neovim is notified at most once per interval, and only when
+    abbreviations changed."""
+
+    def __init__(self, nvim, interval=0.1):
+        self.nvim = nvim
+        self.interval = interval
+
+        self._shown = None
+        self._pending = None
+        self._last_update = None
+        self._timer = None
+
+    def update(self, abbreviations=None, text=None):
+        """Display abbreviations, now or at the end of the current interval
+
+        :abbreviations: [dict] abbreviations to display
+        :text: [str] text before abbreviations"""
+
+        items = (text, tuple(abbreviations.items()) if abbreviations else ())
+
+        if items == (self._pending or self._shown):
+            return
+
+        self._pending = items
+
+        if self._timer is not None:
+            return
+
+        elapsed = None
+        if self._last_update is not None:
+            elapsed = time.monotonic() - self._last_update
+
+        if elapsed is None or elapsed >= self.interval:
+            self._flush()
+        else:
+            self._timer = self.nvim.loop.call_later(self.interval - elapsed,
+                                                    self._flush)
+
+    def _flush(self):
+        self._timer = None
+        items, self._pending = self._pending, None
+
+        if items is None or items == self._shown:
+            return
+
+        text, abbreviations = items
+        msg = TypitLearnManager.format_abbrevs(dict(abbreviations), text)
+
+        self._shown = items
+        self._last_update = time.monotonic()
+        self.nvim.call('tplearn#util#status', msg, async_=True)
+
+    def reset(self):
+        """Cancel pending update and forget displayed abbreviations"""
+
+        if self._timer is not None:
+            self._timer.cancel()
+
+        self._shown = self._pending = self._last_update = self._timer = None
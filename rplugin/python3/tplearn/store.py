@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: store.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import io
+import os
+import re
+import stat
+
+from tplearn import logger
+
+class AbbreviationFile(logger.LoggingMixin):
+
+    """Vimscript file of abbreviations. New abbreviations are appended at the
+    end of the file, which is regularly compacted: rewritten sorted and split
+    by first letter."""
+
+    LINE = 'call tplearn#util#abbreviate("{}", "{}")\n'
+    HEADER = '" TypitLearn abbreviations ({} sorted bytes)\n'
+    HEADER_RE = re.compile(r'" TypitLearn abbreviations \((\d+) sorted bytes\)')
+    LINE_RE = re.compile(r'call tplearn#util#abbreviate\("(.*)", "(.*)"\)$')
+
+    # Compact when appended content is larger than both values
+    MIN_APPENDED_SIZE = 16384
+    MAX_APPENDED_RATIO = 0.25
+
+    def __init__(self, path):
+        self.path = path
+
+    def read(self):
+        """Read abbreviations from the file without sourcing it.
+
+        :returns: [dict] abbreviations, or None if the file contains other
+                  Vimscript commands and has to be sourced"""
+
+        abbreviations = {}
+
+        with open(self.path, 'r', encoding='utf-8', errors='replace') as tpfile:
+            for line in tpfile:
+                line = line.strip()
+
+                if not line or line.startswith('"'):
+                    continue
+
+                match = self.LINE_RE.match(line)
+
+                if not match:
+                    self.info('Unknown command in %s: %r', self.path, line)
+                    return None
+
+                abbreviations[match.group(1)] = match.group(2)
+
+        return abbreviations
+
+    def append(self, abbreviations=None):
+        """Append abbreviations at the end of the file"""
+
+        if not abbreviations:
+            return
+
+        content = ''.join(self.LINE.format(typo, abbreviations[typo])
+                          for typo in sorted(abbreviations, key=str.lower))
+
+        self.info('Append %s abbreviations to %s',
+                  len(abbreviations), self.path)
+
+        if not self._ends_with_newline():
+            content = '\n' + content
+
+        with open(self.path, 'a', encoding='utf-8') as tpfile:
+            tpfile.write(_sanitize(content))
+
+    def needs_compaction(self):
+        """Whether content appended since last compaction is large enough to
+        rewrite the file"""
+
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return True
+
+        sorted_size = self._sorted_size()
+        appended = size - sorted_size
+
+        return appended > max(self.MIN_APPENDED_SIZE,
+                              sorted_size * self.MAX_APPENDED_RATIO)
+
+    def compact(self, abbreviations=None):
+        """Rewrite the file with abbreviations, sorted and split by first
+        letter. The file is replaced at once, so that it is never left
+        truncated."""
+
+        abbreviations = abbreviations or {}
+        content = io.StringIO()
+        letter = ''
+
+        for typo in sorted(abbreviations, key=str.lower):
+            if letter < typo[0].lower():
+                content.write('\n' if letter else '')
+                letter = typo[0].lower()
+                content.write(f'" {letter}\n')
+
+            content.write(self.LINE.format(typo, abbreviations[typo]))
+
+        content = _sanitize(content.getvalue()).encode('utf-8')
+        header = self.HEADER.format(len(content)).encode('utf-8')
+
+        self.info('Write %s abbreviations to %s',
+                  len(abbreviations), self.path)
+
+        # Replace the target of symlinks, not the links themselves
+        path = os.path.realpath(self.path)
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as tpfile:
+            tpfile.write(header)
+            tpfile.write(content)
+            tpfile.flush()
+            os.fsync(tpfile.fileno())
+
+        if os.path.exists(path):
+            os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode))
+
+        os.replace(tmp_path, path)
+
+    def _ends_with_newline(self):
+        try:
+            with open(self.path, 'rb') as tpfile:
+                tpfile.seek(-1, os.SEEK_END)
+                return tpfile.read(1) == b'\n'
+        except OSError:
+            # Missing or empty file
+            return True
+
+    def _sorted_size(self):
+        """Size of the sorted part of the file, read from its header"""
+
+        try:
+            with open(self.path, 'rb') as tpfile:
+                header = tpfile.readline()
+        except OSError:
+            return 0
+
+        match = self.HEADER_RE.match(header.decode('utf-8', 'replace'))
+
+        if not match:
+            return 0
+
+        return len(header) + int(match.group(1))
+
+
+def _sanitize(content):
+    """Replace characters that can't be written as UTF-8"""
+    content = content.encode('utf-8', 'surrogateescape')
+    return content.decode('utf-8', 'replace')
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: tokenizer.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import re
+
+from bisect import bisect_left
+from collections import Counter, namedtuple
+from functools import lru_cache
+
+
+class Tokens(namedtuple('Tokens', ['words', 'starts', 'counts'])):
+
+    """Words of a line, with their start positions and number of
+    occurrences"""
+
+    __slots__ = ()
+
+    def between(self, start, end):
+        """Return words starting between positions start and end"""
+        first = bisect_left(self.starts, start)
+        last = bisect_left(self.starts, end, first)
+        return self.words[first:last]
+
+
+class Tokenizer:
+
+    """Split lines into words. Words of lines before changes are looked up in
+    a cache, since the same original line is compared to each new version of
+    it while it is being edited."""
+
+    WORD_RE = re.compile(r'\w+')
+    WORD_CHAR_RE = re.compile(r'\w')
+
+    def __init__(self, cache_size=128):
+        self.cached_tokens = lru_cache(maxsize=cache_size)(self.tokens)
+
+    def words(self, line, start=0, end=None):
+        """Return words of line[start:end] as a tuple"""
+
+        end = len(line) if end is None else end
+        return tuple(self.WORD_RE.findall(line, start, end))
+
+    def tokens(self, line):
+        """Return Tokens of line"""
+
+        matches = list(self.WORD_RE.finditer(line))
+        words = tuple(m.group() for m in matches)
+
+        return Tokens(words, tuple(m.start() for m in matches), Counter(words))
+
+    def changed_window(self, old, new):
+        """Find the part of old and new lines that differ, extended to word
+        boundaries.
+
+        :old: [str] line before changes
+        :new: [str] line after changes
+        :returns: [tuple] (start, old_end, new_end) so that only
+                  old[start:old_end] was replaced by new[start:new_end]"""
+
+        if old == new:
+            return len(old), len(old), len(new)
+
+        prefix = _common_prefix(old, new)
+        suffix = _common_suffix(old, new, min(len(old), len(new)) - prefix)
+        start, old_end = prefix, len(old) - suffix
+
+        while start > 0 and self.WORD_CHAR_RE.match(old, start - 1):
+            start -= 1
+
+        while old_end < len(old) and self.WORD_CHAR_RE.match(old, old_end):
+            old_end += 1
+
+        return start, old_end, old_end + len(new) - len(old)
+
+    def clear(self):
+        """Empty the cache of tokens"""
+        self.cached_tokens.cache_clear()
+
+
+def _common_prefix(first, second):
+    """Length of the common prefix, found by comparing slices (fast C
+    comparisons) in a binary search"""
+
+    low, high = 0, min(len(first), len(second))
+
+    while low < high:
+        mid = (low + high + 1) // 2
+        if first[low:mid] == second[low:mid]:
+            low = mid
+        else:
+            high = mid - 1
+
+    return low
+
+def _common_suffix(first, second, limit):
+    """Length of the common suffix, at most limit"""
+
+    low, high = 0, limit
+    len_f, len_s = len(first), len(second)
+
+    while low < high:
+        mid = (low + high + 1) // 2
+        if first[len_f-mid:len_f-low] == second[len_s-mid:len_s-low]:
+            low = mid
+        else:
+            high = mid - 1
+
+    return low
+
+
+TOKENIZER = Tokenizer()
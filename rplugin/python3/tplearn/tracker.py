@@ -7,10 +7,18 @@ Author: Gabriel Alcaras
 License: GNU GPL v3
 """
 
-import re
-
 from collections import OrderedDict
+from types import MappingProxyType
 from tplearn import logger
+from tplearn.align import align_words, diff_opcodes
+from tplearn.shadow import ShadowBuffer
+from tplearn.stats import STATS
+from tplearn.tokenizer import TOKENIZER
+
+# Largest number of (old + new) lines diffed to match replaced lines when
+# lines were added or removed. Larger changes are stored without learning.
+MAX_DIFF_LINES = 1000
+
 
 class TypitLearnTracker(logger.LoggingMixin):
 
@@ -19,6 +27,7 @@ class TypitLearnTracker(logger.LoggingMixin):
 
     def __init__(self):
         self._abbrev = OrderedDict()
+        self._view = MappingProxyType(self._abbrev)
         self._buffers = {}
 
     def track_buffer_updates(self, buf, firstline, lastline, linedata):
@@ -31,16 +40,47 @@ class TypitLearnTracker(logger.LoggingMixin):
 
         self.debug('Update buffer %s (add lines %s to %s)',
                    buf.number, firstline, lastline)
-        changed_lines = dict(zip(range(firstline, lastline+1), linedata))
 
         if buf.number not in self._buffers:
-            self._buffers[buf.number] = {}
-
-        self._buffers[buf.number].update(changed_lines)
-        self.debug('Buffers : %s', self._buffers)
+            self._buffers[buf.number] = ShadowBuffer(linedata)
+        else:
+            self._buffers[buf.number].splice(firstline, lastline, linedata)
 
         return self._buffers
 
+    def track_lazily(self, buf, line_count):
+        """Track buf without a snapshot of its lines: lines are unknown (None)
+        until they are prefetched or changed.
+
+        :buf: [Neovim Buffer] buffer to track
+        :line_count: [int] number of lines of buf"""
+
+        self.debug('Track buffer %s lazily (%s lines)', buf.number, line_count)
+        self._buffers[buf.number] = ShadowBuffer([None] * line_count)
+
+    def prefetch(self, bufnr, firstline, linedata):
+        """Store lines that are about to change, if they are still unknown.
+
+        :bufnr: [int] number of the buffer
+        :firstline: [int] first line of linedata
+        :linedata: [list] current lines"""
+
+        shadow = self._buffers.get(bufnr)
+
+        if shadow is None:
+            return
+
+        last = min(firstline + len(linedata), len(shadow))
+
+        for num in range(max(firstline, 0), last):
+            if shadow[num] is None:
+                shadow[num] = linedata[num - firstline]
+
+    def tracks(self, buf):
+        """Whether a snapshot of buf was taken"""
+        return buf.number in self._buffers
+
+    @STATS.timed
     def track_replaced_words(self, buf, firstline, lastline, linedata):
         """Keep track of replaced words based on last buffer changes.
 
@@ -49,44 +89,130 @@ class TypitLearnTracker(logger.LoggingMixin):
         :lastline: [int] last line of changes
         :linedata: [list] changed lines"""
 
-        if (lastline - firstline != 1) or (not linedata) or (len(linedata) > 1):
-            self.debug("Changes can't be handled by TypitLearn.")
+        shadow = self._buffers.get(buf.number)
+
+        if shadow is None:
+            self.debug('Buffer %s is not tracked.', buf.number)
             return
 
-        new_line = linedata[0]
-        old_line = self._buffers[buf.number][firstline]
+        old_lines = shadow.lines(firstline, lastline)
+        replaced, baseline = self._diff_lines(old_lines, linedata)
 
-        word_re = re.compile(r'[^\w]')
-        old_words = [w for p in old_line.split(' ') for w in word_re.split(p)]
-        new_words = [w for p in new_line.split(' ') for w in word_re.split(p)]
+        if baseline != old_lines:
+            shadow.splice(firstline, lastline, baseline)
 
-        for i, word in enumerate(old_words):
-            if i > len(new_words)-1:
-                break
+        # A word can appear several times: a fix wins over a deleted word,
+        # which wins over an unchanged word.
+        changes = OrderedDict()
+        ranks = {}
+        for old_line, new_line in replaced:
+            for old_word, new_word in self._replaced_words(old_line, new_line):
+                rank = (old_word != new_word) + bool(new_word)
 
-            if (word != new_words[i]) or (word in self._abbrev):
-                new = word not in self._abbrev or new_words[i] != self._abbrev[word]
-                self._abbrev.update({word: new_words[i]})
+                if rank < 2 and old_word not in self._abbrev:
+                    continue
 
-                if new:
-                    self._abbrev.move_to_end(word, last=False)
+                if rank >= ranks.get(old_word, 0):
+                    changes[old_word] = new_word
+                    ranks[old_word] = rank
 
-        self.debug('abbrev: {}'.format(self._abbrev))
+        for word, fix in changes.items():
+            if fix in (word, '') or word == '':
+                self._abbrev.pop(word, None)
+                continue
 
-        return
+            new = word not in self._abbrev or fix != self._abbrev[word]
+            self._abbrev.update({word: fix})
 
-    def abbrev(self):
-        """Return filtered abbreviations"""
+            if new:
+                self._abbrev.move_to_end(word, last=False)
+
+        self.debug('abbrev: %s', self._abbrev)
 
-        abbrev = self._abbrev
-        typos = [t for t, f in abbrev.items() if f in (t, '') or t == '']
+        return
 
-        for typo in typos:
-            abbrev.pop(typo)
+    @staticmethod
+    def _diff_lines(old_lines, new_lines):
+        """Match replaced lines between old and new line ranges.
+
+        :old_lines: [list] lines before changes, as they were before recording
+        :new_lines: [list] lines after changes
+        :returns: [tuple] list of (old, new) replaced text, and new lines to
+                  store in the shadow buffer. Modified lines keep their
+                  original content so that fixes are always compared to the
+                  text before recording; added lines, and modified lines that
+                  were unknown (None), are stored as is."""
+
+        if len(old_lines) == len(new_lines) == 1 and old_lines[0] is not None:
+            return [(old_lines[0], new_lines[0])], old_lines
+
+        replaced = []
+        baseline = []
+
+        # Lines can't shift when as many lines are replaced (e.g. :%s): pair
+        # them by position instead of diffing the whole range
+        if len(old_lines) == len(new_lines):
+            for old, new in zip(old_lines, new_lines):
+                if old is None:
+                    baseline.append(new)
+                else:
+                    if old != new:
+                        replaced.append((old, new))
+                    baseline.append(old)
+
+            return replaced, baseline
+
+        if len(old_lines) + len(new_lines) > MAX_DIFF_LINES:
+            return replaced, list(new_lines)
+
+        for tag, i_1, i_2, j_1, j_2 in diff_opcodes(old_lines, new_lines):
+            if tag == 'equal':
+                baseline.extend(old_lines[i_1:i_2])
+            elif tag == 'replace' and i_2 - i_1 == j_2 - j_1:
+                for old, new in zip(old_lines[i_1:i_2], new_lines[j_1:j_2]):
+                    if old is None:
+                        baseline.append(new)
+                    else:
+                        replaced.append((old, new))
+                        baseline.append(old)
+            elif tag == 'replace':
+                # Lines were joined or split: compare text of whole blocks
+                if None not in old_lines[i_1:i_2]:
+                    replaced.append((' '.join(old_lines[i_1:i_2]),
+                                     ' '.join(new_lines[j_1:j_2])))
+                baseline.extend(new_lines[j_1:j_2])
+            elif tag == 'insert':
+                baseline.extend(new_lines[j_1:j_2])
+
+        return replaced, baseline
+
+    def _replaced_words(self, old_line, new_line):
+        """Return (old, new) pairs of words in old and new line. Only the part
+        of the lines that changed is split and aligned; tracked typos found in
+        the rest of the line are returned as unchanged."""
+
+        start, old_end, new_end = TOKENIZER.changed_window(old_line, new_line)
+        old_tokens = TOKENIZER.cached_tokens(old_line)
+
+        old_words = old_tokens.between(start, old_end)
+        new_words = TOKENIZER.words(new_line, start, new_end)
+        pairs = align_words(old_words, new_words)
+
+        for typo in self._abbrev:
+            if old_tokens.counts[typo] > old_words.count(typo):
+                pairs.append((typo, typo))
+
+        return pairs
+
+    def abbrev(self):
+        """Return a read-only view of abbreviations, most recent first. Pairs
+        where the word was restored or deleted are never stored."""
 
-        return abbrev
+        return self._view
 
     def reset(self):
         """Reset stored abbreviations"""
         self._abbrev = OrderedDict()
+        self._view = MappingProxyType(self._abbrev)
         self._buffers = {}
+        TOKENIZER.clear()
@@ -1,6 +1,41 @@
 from shutil import copyfile, rmtree
 import os
-from test.utils import NvimInstance
+import pytest
+from test.utils import NvimInstance, NvimTestClient, tplearn_config
+from tplearn.manager import TypitLearnManager #pylint: disable=import-error
+
+def pytest_addoption(parser):
+    parser.addoption('--benchmark', action='store_true',
+                     help='run tests comparing wall-clock times')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers',
+                            'benchmark: compares wall-clock times, skipped '
+                            'unless --benchmark is given')
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--benchmark'):
+        return
+
+    skip = pytest.mark.skip(reason='benchmark, run with --benchmark')
+
+    for item in items:
+        if 'benchmark' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture
+def manager(tmp_path):
+    """TypitLearnManager with loaded abbreviations, sending requests to a
+    NvimTestClient. Requests sent while loading are forgotten."""
+
+    nvim = NvimTestClient(responses={
+        'tplearn#util#config': tplearn_config(tmp_path),
+        'tplearn#util#abbreviations': {}})
+    loaded = TypitLearnManager(nvim)
+    loaded.load_abbreviations()
+    nvim.requests.clear()
+
+    return loaded
 
 def pytest_sessionstart(session):
     if os.path.exists(os.path.join('test', 'tmp_abbrev')):
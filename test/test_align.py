@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_align.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import random
+
+from difflib import SequenceMatcher
+from tplearn import align #pylint: disable=import-error
+
+
+def test_damerau_levenshtein():
+    assert align.damerau_levenshtein('dgo', 'dog') == 1
+    assert align.damerau_levenshtein('jmps', 'jumps') == 1
+    assert align.damerau_levenshtein('kitten', 'sitting') == 3
+    assert align.damerau_levenshtein('quick', 'WORD') == 5
+    assert align.damerau_levenshtein('quick', 'WORD', limit=2) == 3
+
+def test_plausible_fix():
+    assert align.is_plausible_fix('teh', 'the')
+    assert align.is_plausible_fix('helloworld', 'helloworld3')
+    assert not align.is_plausible_fix('dgo', 'stuff')
+
+def test_diff_opcodes():
+    rand = random.Random(0)
+
+    for _ in range(500):
+        old = rand.choices('abcd', k=rand.randint(0, 20))
+        new = rand.choices('abcd', k=rand.randint(0, 20))
+        opcodes = align.diff_opcodes(old, new)
+
+        rebuilt = [w for _, _, _, j_1, j_2 in opcodes for w in new[j_1:j_2]]
+        common = sum(i_2 - i_1 for tag, i_1, i_2, _, _ in opcodes
+                     if tag == 'equal')
+        lcs = sum(b.size for b in SequenceMatcher(None, old, new,
+                                                 autojunk=False).get_matching_blocks())
+
+        assert rebuilt == new
+        assert common >= lcs
+
+def test_align_words():
+    old = 'The lazy dgo'.split()
+    assert align.align_words(old, 'The very lazy dog'.split()) == [
+        ('The', 'The'), ('lazy', 'lazy'), ('dgo', 'dog')]
+    assert align.align_words(old, 'The dog'.split()) == [
+        ('The', 'The'), ('lazy', ''), ('dgo', 'dog')]
+    assert align.align_words(old, 'The lazy'.split()) == [
+        ('The', 'The'), ('lazy', 'lazy'), ('dgo', '')]
+    assert align.align_words(old, 'The lazy dog'.split()) == [
+        ('The', 'The'), ('lazy', 'lazy'), ('dgo', 'dog')]
+
+def test_align_words_implausible():
+    # Rewrites are not fixes of typos
+    assert align.align_words('The lazy dgo'.split(), 'The lazy cat'.split()) == [
+        ('The', 'The'), ('lazy', 'lazy'), ('dgo', '')]
+    assert align.align_words('the quick fox'.split(), 'the slow fox'.split()) == [
+        ('the', 'the'), ('quick', ''), ('fox', 'fox')]
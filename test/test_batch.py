@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_batch.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+from test.utils import NvimTestClient, tplearn_config as config
+from tplearn.batch import RequestBatch #pylint: disable=import-error
+from tplearn.manager import TypitLearnManager #pylint: disable=import-error
+
+
+def test_batch_single_request():
+    nvim = NvimTestClient()
+
+    with RequestBatch(nvim) as batch:
+        batch.command('echo "hello"')
+        batch.call('tplearn#util#message', 'hello')
+        batch.request('nvim_set_var', 'tplearn_abbrev', {})
+
+    assert nvim.requests == [('nvim_call_atomic', ([
+        ['nvim_command', ['echo "hello"']],
+        ['nvim_call_function', ['tplearn#util#message', ['hello']]],
+        ['nvim_set_var', ['tplearn_abbrev', {}]],
+    ],))]
+
+def test_batch_empty():
+    nvim = NvimTestClient()
+
+    with RequestBatch(nvim):
+        pass
+
+    assert nvim.requests == []
+
+def test_config_cached(tmp_path):
+    nvim = NvimTestClient(responses={'tplearn#util#config': config(tmp_path)})
+    manager = TypitLearnManager(nvim)
+
+    for _ in range(3):
+        manager._get_tpdir()
+
+    assert nvim.requests == [('tplearn#util#config', ())]
+
+    manager.config.invalidate()
+    manager._get_tpdir()
+    assert len(nvim.requests) == 2
+
+def test_save_round_trips(manager):
+    nvim = manager.nvim
+    typos = {f'tpyo{num}': f'typo{num}' for num in range(100)}
+    manager.save_abbreviations(typos)
+    assert [name for name, _ in nvim.requests] == ['nvim_call_atomic']
+
+    manager.save_abbreviations({'teh': 'the'})
+    assert len(nvim.requests) == 2
+
+def test_undo_round_trips(manager):
+    nvim = manager.nvim
+    manager.save_abbreviations({f'tpyo{num}': f'typo{num}' for num in range(100)})
+    nvim.requests.clear()
+
+    manager.rm_last_abbrevs()
+    assert [name for name, _ in nvim.requests] == ['nvim_call_atomic']
+    assert manager._tplearn_abbrev == {}
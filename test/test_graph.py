@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_graph.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import timeit
+
+import pytest
+
+from tplearn.graph import AbbreviationGraph #pylint: disable=import-error
+
+
+def test_mapping():
+    graph = AbbreviationGraph({'teh': 'the', 'jmps': 'jumps'})
+    assert graph == {'teh': 'the', 'jmps': 'jumps'}
+    assert graph['teh'] == 'the'
+    assert 'the' not in graph
+    assert graph.get('the') is None
+
+def test_reverse_index():
+    graph = AbbreviationGraph({'teh': 'the', 'hte': 'the', 'jmps': 'jumps'})
+    assert graph.typos_of('the') == {'teh', 'hte'}
+    assert graph.typos_of('teh') == set()
+
+    graph.update({'teh': 'tech'})
+    assert graph.typos_of('the') == {'hte'}
+    assert graph.typos_of('tech') == {'teh'}
+
+    assert graph.pop('hte') == 'the'
+    assert graph.typos_of('the') == set()
+    assert graph.pop('hte') is None
+
+def test_chain():
+    graph = AbbreviationGraph({'a': 'b', 'b': 'c', 'x': 'y', 'y': 'x'})
+    assert graph.chain('a') == ['a', 'b', 'c']
+    assert graph.chain('c') == ['c']
+    assert graph.chain('x') == ['x', 'y', 'x']
+
+def test_chain_limit():
+    graph = AbbreviationGraph({str(num): str(num + 1) for num in range(1000)})
+    assert len(graph.chain('0')) == AbbreviationGraph.MAX_CHAIN + 1
+
+@pytest.mark.benchmark
+def test_checks_do_not_scan():
+    def lookups(size):
+        graph = AbbreviationGraph({f'tpyo{num}': f'typo{num}'
+                                   for num in range(size)})
+
+        def check():
+            graph.chain('typo1')
+            graph.typos_of('tpyo1')
+
+        return min(timeit.repeat(check, number=1000, repeat=5))
+
+    assert lookups(100000) < 5 * lookups(100)
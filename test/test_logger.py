@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_logger.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import logging
+
+from collections import OrderedDict
+from types import MappingProxyType
+
+import pytest
+
+from tplearn import logger #pylint: disable=import-error
+from test.utils import start_record, LINE
+
+
+class Formatted:
+    count = 0
+
+    def __str__(self):
+        Formatted.count += 1
+        return 'formatted'
+
+class FormattedDict(OrderedDict):
+    def __repr__(self):
+        Formatted.count += 1
+        return super().__repr__()
+
+@pytest.fixture
+def log_level(tmp_path):
+    handlers = list(logger.LOGGER.handlers)
+
+    def setup(level):
+        Formatted.count = 0
+        logger.LoggingMixin()._setup_log(str(tmp_path / 'tplearn.log'), level, 1)
+
+        # Records of the setup are written by the background thread, wait
+        # for them so that tests only see their own records
+        logger.LoggingMixin._log_handler.queue.join()
+
+    yield setup
+
+    logger.LoggingMixin()._flush_log()
+
+    for handler in logger.LOGGER.handlers[len(handlers):]:
+        logger.LOGGER.removeHandler(handler)
+        handler.close()
+
+    logger.LOGGER.setLevel(logging.NOTSET)
+    logger.LoggingMixin.is_log_enabled = False
+    logger.LoggingMixin.nvid = None
+
+def test_debug_not_formatted_at_info(log_level):
+    log_level('info')
+    mixin = logger.LoggingMixin()
+
+    mixin.debug('debug %s', Formatted())
+    assert Formatted.count == 0
+
+    mixin.info('info %s', Formatted())
+    assert Formatted.count > 0
+
+def test_debug_formatted_at_debug(log_level):
+    log_level('debug')
+    logger.LoggingMixin().debug('debug %s', Formatted())
+    assert Formatted.count > 0
+
+def test_hot_path_not_formatted_at_info(log_level, monkeypatch):
+    log_level('info')
+    formatted = []
+    get_message = logging.LogRecord.getMessage
+
+    def count_formatting(record):
+        formatted.append(record.msg)
+        return get_message(record)
+
+    monkeypatch.setattr(logging.LogRecord, 'getMessage', count_formatting)
+
+    plugin, buf = start_record(1000)
+    tracker = plugin._sessions[buf.number]
+    tracker._abbrev = FormattedDict()
+    tracker._view = MappingProxyType(tracker._abbrev)
+
+    for _ in range(100):
+        plugin._on_buf_lines_event(buf, 2, 500, 501,
+                                   [LINE.replace('dgo', 'dog')], False)
+
+    assert formatted == []
+    assert Formatted.count == 0
+
+def test_flush_writes_queued_records(log_level, tmp_path):
+    log_level('debug')
+    mixin = logger.LoggingMixin()
+
+    for num in range(1000):
+        mixin.debug('message %s', num)
+
+    mixin._flush_log()
+    lines = (tmp_path / 'tplearn.log').read_text().splitlines()
+    assert lines[-1].endswith('LoggingMixin (1) :: message 999')
+    assert not logger.LoggingMixin.is_log_enabled
+
+def test_full_queue_drops_records(log_level, tmp_path, monkeypatch):
+    monkeypatch.setattr(logger, 'LOG_QUEUE_SIZE', 10)
+    log_level('debug')
+    mixin = logger.LoggingMixin()
+
+    # Stop the writer thread while the queue fills up
+    listener = logger.LoggingMixin._log_listener
+    listener.stop()
+
+    for num in range(100):
+        mixin.debug('message %s', num)
+
+    assert logger.LoggingMixin._log_handler.dropped == 90
+
+    listener.start()
+    mixin._flush_log()
+    lines = (tmp_path / 'tplearn.log').read_text().splitlines()
+    assert lines[-2].endswith('message 9')
+    assert lines[-1].endswith('Dropped 90 log messages')
@@ -6,8 +6,14 @@ File: test_manager.py.py
 Author: Gabriel Alcaras
 License: GNU GPL v3
 """
+import time
+
+import pytest
+
 from test.utils import NvimInstance
 from tplearn import manager #pylint: disable=import-error
+from tplearn.batch import RequestBatch #pylint: disable=import-error
+from tplearn.store import AbbreviationFile #pylint: disable=import-error
 
 NVa = NvimInstance()
 NVb = NvimInstance()
@@ -24,23 +30,168 @@ def test_fix_typos():
     assert NVa.nvim.buffers[1][5] == 'jmpstest (should stay the same)'
     assert NVa.nvim.buffers[1][6] == 'test jumps, test (should become jumps)'
 
+def test_fixed_lines():
+    lines = ['dgo (x)', 'jmps (y)', 'jmpstest', 'test jmps, test', 'teh']
+    fixed = MANAGER._fixed_lines(lines, {'jmps': 'jumps', 'dgo': 'dog'})
+    assert fixed == [(0, 2, ['dog (x)', 'jumps (y)']),
+                     (3, 4, ['test jumps, test'])]
+
+@pytest.mark.benchmark
+def test_fix_typos_large_buffer():
+    NVa.cleanup()
+    lines = ['test jmps, test' if i % 100 == 0 else 'regular text line'
+             for i in range(100000)]
+    typos = {f'typo{i}': f'fix{i}' for i in range(49)}
+    typos['jmps'] = 'jumps'
+
+    NVa.nvim.current.buffer[:] = lines
+    start = time.perf_counter()
+    for typo, fix in typos.items():
+        NVa.nvim.command(r'%s/\<{}\>/{}/ge'.format(typo, fix))
+        NVa.nvim.command('nohl')
+    one_by_one = time.perf_counter() - start
+
+    NVa.nvim.current.buffer[:] = lines
+    start = time.perf_counter()
+    MANAGER.fix_typos(typos)
+    batched = time.perf_counter() - start
+
+    assert NVa.nvim.current.buffer[0] == 'test jumps, test'
+    assert NVa.nvim.current.buffer[1] == 'regular text line'
+    assert batched < one_by_one
+
+def test_fix_file(tmp_path):
+    text_file = tmp_path / 'text.md'
+    text_file.write_text('jmps (should become jumps)\njmpstest\n')
+    other_file = tmp_path / 'other.md'
+    other_file.write_text('Nothing to fix\n')
+
+    assert MANAGER._fix_file(str(text_file), {'jmps': 'jumps'})
+    assert not MANAGER._fix_file(str(other_file), {'jmps': 'jumps'})
+    assert text_file.read_text() == 'jumps (should become jumps)\njmpstest\n'
+    assert other_file.read_text() == 'Nothing to fix\n'
+
 def test_load_abbreviations():
     MANAGER.load_abbreviations()
     assert MANAGER._all_abbrev == {'teh': 'the', 'jmps': 'jumps',
                                    'helloworld': 'helloworld2'}
     assert MANAGER._tplearn_abbrev == {'teh': 'the', 'jmps': 'jumps'}
 
+def test_other_abbreviations():
+    assert MANAGER._other_abbreviations() == {'helloworld': 'helloworld2'}
+
+    # Cached until invalidated
+    NVa.nvim.command('iabbrev tmw two more words')
+    assert MANAGER._other_abbreviations() == {'helloworld': 'helloworld2'}
+
+    MANAGER.invalidate_other_abbreviations()
+    assert MANAGER._other_abbreviations() == {'helloworld': 'helloworld2',
+                                              'tmw': 'two more words'}
+
+    NVa.nvim.command('iunabbrev tmw')
+    MANAGER.invalidate_other_abbreviations()
+    assert MANAGER._other_abbreviations() == {'helloworld': 'helloworld2'}
+
+@pytest.mark.benchmark
+def test_load_abbreviations_benchmark(tmp_path):
+    abbrev_file = tmp_path / 'all.vim'
+
+    for size in [1000, 10000, 100000]:
+        AbbreviationFile(str(abbrev_file)).compact(
+            {f'tpyo{i}': f'typo{i}' for i in range(size)})
+
+        start = time.perf_counter()
+        NVa.nvim.vars['tplearn_abbrev'] = {}
+        NVa.nvim.command(f'silent source {abbrev_file}')
+        sourced = time.perf_counter() - start
+
+        start = time.perf_counter()
+        MANAGER._tplearn_abbrev = AbbreviationFile(str(abbrev_file)).read()
+        with RequestBatch(MANAGER.nvim) as batch:
+            MANAGER._define_abbreviations(batch, MANAGER._tplearn_abbrev)
+        native = time.perf_counter() - start
+
+        assert NVa.nvim.eval('len(g:tplearn_abbrev)') == size
+        if size >= 10000:
+            assert native < sourced
+
+    NVa.nvim.command('iabclear')
+    NVa.cleanup()
+    MANAGER.load_abbreviations()
+
+def test_lazy_load_abbreviations(tmp_path):
+    AbbreviationFile(str(tmp_path / 'all.vim')).compact(
+        {f'tpyo{i}': f'typo{i}' for i in range(10000)})
+    NVa.nvim.vars['tplearn_dir'] = str(tmp_path)
+    MANAGER.config.invalidate()
+
+    # Lazy loading only reads files, abbreviations are defined later
+    MANAGER.load_abbreviations(lazy=True)
+    assert NVa.nvim.command_output('iabbrev tpyo1').strip() == 'No abbreviation found'
+    MANAGER.define_abbreviations()
+    assert 'typo1' in NVa.nvim.command_output('iabbrev tpyo1')
+
+    NVa.nvim.vars['tplearn_dir'] = './test/tmp_abbrev'
+    MANAGER.config.invalidate()
+    NVa.nvim.command('iabclear')
+    NVa.cleanup()
+
+@pytest.mark.benchmark
+def test_lazy_load_abbreviations_benchmark(tmp_path):
+    AbbreviationFile(str(tmp_path / 'all.vim')).compact(
+        {f'tpyo{i}': f'typo{i}' for i in range(10000)})
+    NVa.nvim.vars['tplearn_dir'] = str(tmp_path)
+    MANAGER.config.invalidate()
+
+    start = time.perf_counter()
+    MANAGER.load_abbreviations()
+    eager = time.perf_counter() - start
+    NVa.nvim.command('iabclear')
+
+    start = time.perf_counter()
+    MANAGER.load_abbreviations(lazy=True)
+    lazy = time.perf_counter() - start
+
+    assert lazy < eager
+
+    NVa.nvim.vars['tplearn_dir'] = './test/tmp_abbrev'
+    MANAGER.config.invalidate()
+    NVa.nvim.command('iabclear')
+    NVa.cleanup()
+    MANAGER.load_abbreviations()
+
+def test_save_without_reload(tmp_path):
+    NVa.cleanup()
+    MANAGER.load_abbreviations()
+
+    MANAGER.save_abbreviations({'tset': 'test'})
+    assert NVa.abb['tset'] == 'test'
+    assert 'test' in NVa.nvim.command_output('iabbrev tset')
+    assert not MANAGER.reload_if_changed()
+
+    # Changes from other instances are detected
+    with open('./test/tmp_abbrev/all.vim', 'a') as tmp:
+        tmp.write('call tplearn#util#abbreviate("wrold", "world")\n')
+
+    assert MANAGER.reload_if_changed()
+    assert MANAGER._tplearn_abbrev['wrold'] == 'world'
+
+    MANAGER.rm_last_abbrevs()
+    assert 'tset' not in NVa.abb
+    assert NVa.nvim.command_output('iabbrev tset').strip() == 'No abbreviation found'
+
 def test_changing_word():
     NVa.cleanup()
 
-    NVa.play_record(['The WORD brown fox jmps over the lazy dgo'])
-    assert NVa.abb['quick'] == 'WORD'
-    assert NVa.get_last_message() == '[TypitLearn] Recorded: "quick" => "WORD"'
+    NVa.play_record(['The quack brown fox jmps over the lazy dgo'])
+    assert NVa.abb['quick'] == 'quack'
+    assert NVa.get_last_message() == '[TypitLearn] Recorded: "quick" => "quack"'
 
 def test_fix_valid_word():
     assert MANAGER._check_abbreviations({'quick': 'WORD'}) == {}
 
     NVa.nvim.command('let g:tplearn_spellcheck = 1')
+    MANAGER.config.invalidate()
 
     assert 'quick' in MANAGER._check_abbreviations({'quick': 'WORD'}).values()
     assert MANAGER._check_abbreviations({'quickk': 'WORD'}) == {}
@@ -65,7 +216,7 @@ def test_recording_two_instances():
     assert NVa.abb == NVb.abb
 
     # Record new typo in 1, abbreviations are now different
-    NVa.play_record(['The quick brown fox jmps over the lazy yoloo'])
+    NVa.play_record(['The quick brown fox jmps over the lazy dgoo'])
     assert NVa.abb != NVb.abb
 
     # Reload abbreviations in 2, abbrevs are the same again
@@ -77,13 +228,13 @@ def test_recording_two_instances():
 
     # Record new typo in 2, then in 1. Abbreviations in 1 should contain all
     # abbreviations from 2 + the new one.
-    NVb.play_record(['The quick brown fox jmps over the lzy yoloo'])
+    NVb.play_record(['The quick brown fox jmps over the lzy dgoo'])
     assert NVb.abb['lazy'] == 'lzy'
 
-    NVa.play_record(['The quick brown fox jmps ovar the lazy dog'])
+    NVa.play_record(['The quick brwn fox jmps ovar the lazy dgoo'])
     assert NVa.abb['lazy'] == 'lzy'
     assert NVa.abb['over'] == 'ovar'
-    assert NVa.abb['yoloo'] == 'dog'
+    assert NVa.abb['brown'] == 'brwn'
     assert 'over' not in NVb.abb
 
     # Edit the abbrev file by removing the last abbrev, then record a new
@@ -99,34 +250,43 @@ def test_recording_two_instances():
         tmp.writelines(lines)
 
     NVb.nvim.command('TypitLearnReload')
-    assert 'yoloo' not in NVb.abb
+    assert 'brown' in NVb.abb
+    assert 'over' not in NVb.abb
 
-def test_prompt_answer_no():
+def test_review_reject():
     NV2.cleanup()
     NV2.nvim.current.buffer[1] = 'helloworld'
 
-    NV2.play_record(['The quick brown fox HELLO over the lazy dgo',
-                           'helloworld3'], feedkeys=['N', 'N'])
+    NV2.play_record(['The quick brown fox jmpss over the lazy dgo',
+                     'helloworld3'])
+    review = NV2.nvim.current.buffer
+    assert review.name.endswith('typitlearn://review')
+    assert 'jmps => jmpss' in review[:]
+    assert 'helloworld => helloworld3' in review[:]
+
+    NV2.review([])
     assert NV2.abb['jmps'] == 'jumps'
     assert 'helloworld' not in NV2.abb
     assert NV2.get_last_message() == '[TypitLearn] Recorded: no fixes'
 
+def test_review_accept():
     NV2.cleanup()
     NV2.nvim.current.buffer[1] = 'helloworld'
 
-    NV2.play_record(['The quick brown fox HELLO over the lazy dgo',
-                           'helloworld3'], feedkeys=['Y', 'N'])
+    NV2.play_record(['The quick brown fox jmpss over the lazy dgo',
+                     'helloworld3'])
+    NV2.review(['helloworld'])
     assert NV2.abb['jmps'] == 'jumps'
     assert NV2.abb['helloworld'] == 'helloworld3'
     assert NV2.get_last_message() == '[TypitLearn] Recorded: "helloworld" => "helloworld3"'
 
-def test_prompt_answer_abort():
+def test_review_discard():
     NV2.cleanup()
     NV2.nvim.current.buffer[1] = 'helloworld'
 
-    NV2.play_record(['The quick brown fox HELLO over the lazy dgo',
-                           'helloworld4'],
-                          feedkeys=['A'])
+    NV2.play_record(['The quick brown fox jmpss over the lazy dgo',
+                     'helloworld4'])
+    NV2.nvim.command('bwipeout!')
     assert NV2.abb['jmps'] == 'jumps'
     assert NV2.abb['helloworld'] == 'helloworld3'
     assert NV2.get_last_message() == '[TypitLearn] Recorded: no fixes'
@@ -136,11 +296,11 @@ def test_undo_last_abbrev():
 
     NVa.undo()
     assert NVa.get_last_message()[0:21] == '[TypitLearn] Deleted:'
-    assert 'yoloo' not in NVa.abb
+    assert 'brown' not in NVa.abb
     assert 'over' not in NVa.abb
 
     # Test unabbreviate
-    assert NVa.nvim.command_output(':iabbrev yoloo').strip() == 'No abbreviation found'
+    assert NVa.nvim.command_output(':iabbrev brown').strip() == 'No abbreviation found'
     assert NVa.nvim.command_output(':iabbrev over').strip() == 'No abbreviation found'
 
     NVa.undo()
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_manager_offline.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import shutil
+import stat
+
+from test.utils import NvimTestBuffer, NvimTestClient
+from tplearn.manager import TypitLearnManager #pylint: disable=import-error
+
+
+def test_spellcheck_batched(manager, tmp_path):
+    spellfile = tmp_path / 'en.utf-8.add'
+    buffer_options = {'spelllang': 'en', 'spellfile': [str(spellfile)]}
+
+    def spellcheck(words):
+        return {**buffer_options, 'verdicts': ['bad'] * len(words)}
+
+    nvim = manager.nvim
+    nvim.responses['tplearn#util#config']['spellcheck'] = 1
+    nvim.responses['tplearn#util#spellcheck'] = spellcheck
+    manager.config.invalidate()
+
+    def checked():
+        return [sorted(args[0]) for name, args in nvim.requests
+                if name == 'tplearn#util#spellcheck']
+
+    for _ in range(3):
+        assert manager._check_abbreviations({'teh': 'the', 'tset': 'test'}) == {}
+
+    # Known words are not checked again
+    assert checked() == [['teh', 'tset'], [], []]
+
+    # Verdicts depend on the spelllang of the current buffer
+    nvim.requests.clear()
+    buffer_options = {'spelllang': 'fr', 'spellfile': []}
+    manager._check_abbreviations({'teh': 'the', 'tset': 'test'})
+    assert checked() == [[], ['teh', 'tset']]
+    assert sorted(manager._spelling) == ['en', 'fr']
+
+    # Switching back uses memoized verdicts, until words are added to the
+    # spell files
+    nvim.requests.clear()
+    buffer_options = {'spelllang': 'en', 'spellfile': [str(spellfile)]}
+    manager._check_abbreviations({'teh': 'the'})
+    assert checked() == [[]]
+
+    spellfile.write_text('tset\n')
+    manager._check_abbreviations({'teh': 'the'})
+    assert checked() == [[], [], ['teh']]
+
+def test_review_flagged(manager):
+    nvim = manager.nvim
+    manager.save_abbreviations({'teh': 'the', 'wrod': 'word'})
+    nvim.requests.clear()
+
+    saved = manager.save_abbreviations({'teh': 'thee', 'wodr': 'word',
+                                        'tset': 'test', 'hte': 'teh'})
+    assert saved == {'wodr': 'word', 'tset': 'test'}
+
+    # All flagged abbreviations are reviewed at once
+    assert manager.review_flagged()
+    (_, (calls,)), = [request for request in nvim.requests
+                      if request[0] == 'nvim_call_atomic'][-1:]
+    lines = calls[0][1][1][0]
+    assert 'teh => thee' in lines
+    assert 'hte => teh' in lines
+    assert '" "teh" already expands to "the". Expand to "thee" instead?' in lines
+
+    assert manager.save_reviewed(['teh => thee']) == {'teh': 'thee'}
+    assert manager._tplearn_abbrev['teh'] == 'thee'
+    assert 'hte' not in manager._tplearn_abbrev
+
+    assert manager.save_reviewed([]) is None
+    assert not manager.review_flagged()
+
+def test_other_abbreviations_cached(manager):
+    def fetches():
+        return len([name for name, _ in manager.nvim.requests
+                    if name == 'tplearn#util#abbreviations'])
+
+    manager.save_abbreviations({'teh': 'the'})
+    manager.load_abbreviations()
+    assert fetches() == 0
+
+    # Removing abbreviations may change other ones
+    manager.rm_last_abbrevs()
+    manager.load_abbreviations()
+    assert fetches() == 1
+
+def test_redundancies(manager):
+    manager.save_abbreviations({'teh': 'the', 'a': 'b', 'b': 'c'})
+
+    check = manager._check_redundancies
+    assert check('wodr', 'word') is None
+    assert check('teh', 'tech') == ('"teh" already expands to "the". '
+                                    'Expand to "tech" instead?')
+    assert check('c', 'a') == ('"c" => "a" => "b" => "c" would be a cycle. '
+                               'Expand "c" anyway?')
+    assert check('hte', 'teh') == ('"teh" expands to "the". '
+                                   'Use as a fix of "hte" instead?')
+    assert check('the', 'thy') == ('"the" is the fix of "teh". '
+                                   'Use it as a typo of "thy" instead?')
+
+def test_fix_file_symlink(tmp_path):
+    manager = TypitLearnManager(NvimTestClient())
+    target = tmp_path / 'target.md'
+    target.write_text('jmps\n')
+    target.chmod(0o640)
+    link = tmp_path / 'link.md'
+    link.symlink_to(target)
+
+    assert manager._fix_file(str(link), {'jmps': 'jumps'})
+    assert link.is_symlink()
+    assert target.read_text() == 'jumps\n'
+    assert stat.S_IMODE(target.stat().st_mode) == 0o640
+    assert sorted(path.name for path in tmp_path.iterdir()) == ['link.md',
+                                                                'target.md']
+
+def test_fix_file_error(tmp_path, monkeypatch):
+    manager = TypitLearnManager(NvimTestClient())
+    text_file = tmp_path / 'text.md'
+    text_file.write_text('jmps\n')
+
+    def fail(*args):
+        raise OSError('copymode failed')
+
+    monkeypatch.setattr(shutil, 'copymode', fail)
+
+    assert not manager._fix_file(str(text_file), {'jmps': 'jumps'})
+    assert text_file.read_text() == 'jmps\n'
+    assert [path.name for path in tmp_path.iterdir()] == ['text.md']
+
+def test_fix_files_while_walking(tmp_path):
+    manager = TypitLearnManager(NvimTestClient())
+
+    for name in ['a', 'b']:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / 'text.md').write_text('jmps\n')
+
+    work = manager._fix_files(str(tmp_path), {'jmps': 'jumps'}, set())
+
+    # Files are fixed one at a time while walking
+    next(work)
+    next(work)
+    texts = sorted((tmp_path / name / 'text.md').read_text()
+                   for name in ['a', 'b'])
+    assert texts == ['jmps\n', 'jumps\n']
+
+    list(work)
+    assert (tmp_path / 'a' / 'text.md').read_text() == 'jumps\n'
+    assert (tmp_path / 'b' / 'text.md').read_text() == 'jumps\n'
+
+def test_fix_buffers_wiped():
+    nvim = NvimTestClient(line_count=1)
+    manager = TypitLearnManager(nvim)
+    bufs = [NvimTestBuffer(['jmps'], number) for number in (1, 2, 3)]
+    nvim.buffers = {buf.number: buf for buf in bufs}
+
+    work = manager._fix_buffers([1, 2, 3], {'jmps': 'jumps'})
+    next(work)
+
+    # Buffers wiped between steps are skipped
+    bufs[0].valid = False
+    del nvim.buffers[2]
+    list(work)
+
+    fixed = [args[0] for name, args in nvim.requests
+             if name == 'nvim_call_atomic']
+    assert [call[1][0] for calls in fixed for call in calls] == [bufs[2]]
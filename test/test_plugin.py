@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_plugin.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import asyncio
+import os
+import re
+import subprocess
+import sys
+import timeit
+
+import pytest
+
+from tplearn import TypitLearn #pylint: disable=import-error
+from test.utils import (LINE, NvimTestBuffer, NvimTestClient, start_record,
+                        tplearn_config)
+
+
+def time_per_event(num_lines, events=200):
+    plugin, buf = start_record(num_lines)
+    line = num_lines // 2
+
+    def keystroke():
+        plugin._on_buf_lines_event(buf, 2, line, line+1, [LINE], False)
+
+    return min(timeit.repeat(keystroke, number=events, repeat=5)) / events
+
+def test_line_count_from_snapshot():
+    plugin, buf = start_record(10)
+    assert plugin._line_count(buf) == 10
+
+    # Open a line, delete two lines, then join two lines
+    plugin._on_buf_lines_event(buf, 2, 3, 3, [''], False)
+    assert plugin._line_count(buf) == 11
+    plugin._on_buf_lines_event(buf, 3, 0, 2, [], False)
+    assert plugin._line_count(buf) == 9
+    plugin._on_buf_lines_event(buf, 4, 4, 6, [LINE + LINE], False)
+    assert plugin._line_count(buf) == 8
+
+    assert buf.fetched_lines == 0
+    assert ('nvim_buf_line_count', (buf,)) not in plugin.nvim.requests
+
+def test_line_count_fallback():
+    plugin = TypitLearn(NvimTestClient(line_count=42))
+    buf = NvimTestBuffer([LINE])
+
+    assert plugin._line_count(buf) == 42
+    assert plugin._line_count(buf) == 42
+    assert plugin.nvim.requests == [('nvim_buf_line_count', (buf,))]
+
+@pytest.mark.benchmark
+def test_event_latency_flat():
+    small = time_per_event(1000)
+    large = time_per_event(200000)
+
+    assert large < small * 5
+
+def import_times():
+    """Import time of modules imported by the plugin, once pynvim is already
+    imported (like in the remote plugin host)"""
+
+    env = dict(os.environ, PYTHONPATH=os.path.join('rplugin', 'python3'))
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c',
+                             'import pynvim; import tplearn'],
+                            env=env, stderr=subprocess.PIPE, check=True,
+                            universal_newlines=True).stderr
+
+    times = {}
+    for line in output.splitlines():
+        match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| (\s*)(\S+)', line)
+
+        if match:
+            times[match.group(3)] = int(match.group(1))
+
+    return times
+
+def test_import_time():
+    times = import_times()
+    modules = list(times)
+    plugin_modules = modules[modules.index('pynvim') + 1:]
+
+    for heavy in ['numpy', 'logging.handlers', 'difflib', 'shutil', 'platform']:
+        assert heavy not in plugin_modules
+
+@pytest.mark.benchmark
+def test_import_time_benchmark():
+    times = import_times()
+    assert times['tplearn'] < times['pynvim'] / 2
+
+def test_sessions_per_buffer(tmp_path):
+    plugin = TypitLearn(NvimTestClient(responses={
+        'tplearn#util#config': tplearn_config(tmp_path),
+        'tplearn#util#abbreviations': {}}))
+    bufs = [NvimTestBuffer([LINE] * 3, number) for number in (1, 2)]
+    other = NvimTestBuffer([LINE] * 3, 3)
+
+    for buf in bufs:
+        plugin._start_session(buf)
+        plugin._on_buf_lines_event(buf, 1, 0, -1, buf._content, False)
+
+    plugin._on_buf_lines_event(bufs[0], 2, 0, 1, [LINE.replace('dgo', 'dog')],
+                               False)
+    plugin._on_buf_lines_event(bufs[1], 2, 2, 3, [LINE.replace('jmps', 'jumps')],
+                               False)
+
+    assert dict(plugin._sessions[1].abbrev()) == {'dgo': 'dog'}
+    assert dict(plugin._sessions[2].abbrev()) == {'jmps': 'jumps'}
+
+    # Buffers that are not recorded are ignored
+    plugin._on_buf_lines_event(other, 1, 0, -1, other._content, False)
+    assert 3 not in plugin._sessions
+    assert 3 not in plugin._line_counts
+
+    # Unloaded buffers stop their own session only, and their fixes are
+    # learned
+    plugin._on_nvim_buf_detach_event(bufs[0])
+    assert list(plugin._sessions) == [2]
+    assert dict(plugin.manager._tplearn_abbrev) == {'dgo': 'dog'}
+    assert plugin.nvim.vars['tplearn_record'] == 1
+
+    plugin._on_nvim_buf_detach_event(bufs[1])
+    assert plugin._sessions == {}
+    assert plugin.nvim.vars['tplearn_record'] == 0
+
+def test_stop_cancels_status(tmp_path):
+    nvim = NvimTestClient(responses={
+        'tplearn#util#config': tplearn_config(tmp_path),
+        'tplearn#util#abbreviations': {}})
+
+    def message(*args):
+        # Like pynvim, run the event loop while waiting for a response
+        nvim.loop.run_until_complete(asyncio.sleep(0.2))
+
+    nvim.responses['tplearn#util#message'] = message
+
+    plugin = TypitLearn(nvim)
+    buf = NvimTestBuffer([LINE])
+    plugin._record_start(buf)
+    plugin._on_buf_lines_event(buf, 1, 0, -1, buf._content, False)
+
+    # The second update waits for the end of the interval
+    plugin._on_buf_lines_event(buf, 2, 0, 1, [LINE.replace('dgo', 'dog')],
+                               False)
+    plugin._record_stop(buf)
+
+    names = [name for name, _ in plugin.nvim.requests
+             if name.startswith('tplearn#util#')]
+    assert names[-1] == 'tplearn#util#message'
+    assert names.count('tplearn#util#status') == 1
+    plugin.nvim.loop.close()
+
+def test_lazy_snapshot():
+    config = {'status_interval': 100, 'lazy_snapshot': 1}
+    plugin = TypitLearn(NvimTestClient(line_count=100000,
+                                       responses={'tplearn#util#config': config}))
+    buf = NvimTestBuffer([LINE] * 100000)
+    plugin._record_start(buf)
+
+    (_, (calls,)), = [request for request in plugin.nvim.requests
+                      if request[0] == 'nvim_call_atomic']
+    assert calls[0] == ['nvim_buf_attach', [buf, False, {}]]
+    assert buf.fetched_lines == 0
+
+    plugin._prefetch([buf.number, 49999, [LINE]])
+    plugin._on_buf_lines_event(buf, 2, 49999, 50000,
+                               [LINE.replace('dgo', 'dog')], False)
+    assert dict(plugin._sessions[buf.number].abbrev()) == {'dgo': 'dog'}
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_shadow.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import random
+import sys
+
+import pytest
+
+from tplearn.shadow import ShadowBuffer #pylint: disable=import-error
+
+
+def test_shadow_splice():
+    shadow = ShadowBuffer(['a', 'b', 'c'])
+
+    shadow.splice(1, 2, ['B'])        # Change one line
+    assert list(shadow) == ['a', 'B', 'c']
+
+    shadow.splice(1, 1, ['x', 'y'])   # Insert two lines
+    assert list(shadow) == ['a', 'x', 'y', 'B', 'c']
+
+    shadow.splice(0, 2, [])           # Delete two lines
+    assert list(shadow) == ['y', 'B', 'c']
+
+    shadow.splice(3, 3, ['d'])        # Append a line
+    assert list(shadow) == ['y', 'B', 'c', 'd']
+
+    shadow.splice(1, 3, ['Bc'])       # Join two lines
+    assert list(shadow) == ['y', 'Bc', 'd']
+
+    assert len(shadow) == 3
+    assert shadow[-1] == 'd'
+    assert shadow.lines(1, 10) == ['Bc', 'd']
+
+    with pytest.raises(IndexError):
+        shadow[3] #pylint: disable=pointless-statement
+
+def test_shadow_random_splices():
+    rand = random.Random(0)
+    expected = [str(i) for i in range(200)]
+    shadow = ShadowBuffer(expected)
+
+    for i in range(2000):
+        first = rand.randint(0, len(expected))
+        last = rand.randint(first, min(first + 5, len(expected)))
+        lines = [f'{i}-{j}' for j in range(rand.randint(0, 8))]
+
+        expected[first:last] = lines
+        shadow.splice(first, last, lines)
+
+        assert len(shadow) == len(expected)
+        assert shadow[first-1 if first else 0] == expected[first-1 if first else 0]
+
+    assert list(shadow) == expected
+
+def test_shadow_memory():
+    lines = [f'line {i}' for i in range(100000)]
+
+    shadow = ShadowBuffer(lines)
+    as_dict = dict(enumerate(lines))
+
+    assert sys.getsizeof(shadow._lines) * 2 < sys.getsizeof(as_dict)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_stats.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import json
+
+from test.utils import NvimTestClient, start_record, LINE
+from tplearn.stats import BUCKETS, STATS, Stats, Timing #pylint: disable=import-error
+
+
+def keystrokes(plugin, buf, count):
+    for _ in range(count):
+        plugin._on_buf_lines_event(buf, 2, 5, 6, [LINE.replace('dgo', 'dog')],
+                                   False)
+
+def test_disabled_records_nothing():
+    plugin, buf = start_record(10)
+    keystrokes(plugin, buf, 10)
+
+    assert STATS.timings == {}
+
+def test_timed_methods():
+    plugin, buf = start_record(10)
+    STATS.enable()
+
+    try:
+        keystrokes(plugin, buf, 10)
+    finally:
+        STATS.disable()
+
+    keystrokes(plugin, buf, 10)
+    timings = STATS.as_dict()['timings']
+    STATS.reset()
+
+    event = timings['TypitLearn._on_buf_lines_event']
+    assert event['calls'] == 10
+    assert sum(event['buckets'].values()) == 10
+    assert timings['TypitLearnTracker.track_replaced_words']['calls'] == 10
+    assert event['max_ms'] >= event['mean_ms'] > 0
+
+def test_histogram_buckets():
+    timing = Timing()
+
+    for duration in [0.05, 0.3, 0.3, 5000]:
+        timing.add(duration)
+
+    values = timing.as_dict()
+    assert len(values['buckets']) == len(BUCKETS) + 1
+    assert values['buckets']['0.1'] == 1
+    assert values['buckets']['0.5'] == 2
+    assert values['buckets']['inf'] == 1
+    assert values['max_ms'] == 5000
+
+def test_rpc_counts(tmp_path):
+    nvim = NvimTestClient()
+    stats = Stats()
+
+    @stats.timed
+    def outer():
+        nvim.request('nvim_buf_line_count', None)
+        inner()
+
+    @stats.timed
+    def inner():
+        nvim.request('nvim_command', 'echo')
+        nvim.request('nvim_command', 'echo', async_=True)
+
+    stats.enable(nvim)
+    outer()
+    stats.disable()
+    outer()
+
+    assert stats.timings[outer.__qualname__].rpcs == 2
+    assert stats.timings[inner.__qualname__].rpcs == 1
+    assert stats.counters['requests'] == 2
+    assert stats.counters['notifications'] == 1
+    assert stats.counters['nvim_command'] == 2
+
+    stats.dump(str(tmp_path / 'stats.json'))
+    dumped = json.loads((tmp_path / 'stats.json').read_text())
+    assert dumped['counters']['requests'] == 2
+    assert dumped['timings'][outer.__qualname__]['calls'] == 1
+
+    report = stats.report()
+    assert report[0] == 'TypitLearn stats (off)'
+    assert report[-1] == 'requests: 2, notifications: 1'
+
+def test_dump_command(tmp_path, monkeypatch):
+    plugin, _ = start_record(10)
+    monkeypatch.setenv('HOME', str(tmp_path))
+
+    plugin._stats(['~/stats.json'])
+    assert json.loads((tmp_path / 'stats.json').read_text())['enabled'] is False
+
+    # Errors are reported instead of raised
+    plugin._stats([str(tmp_path / 'missing' / 'stats.json')])
+    assert plugin.nvim.requests[-1] == (
+        'tplearn#util#message',
+        (f'Could not write stats to {tmp_path / "missing" / "stats.json"}',))
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_status.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import asyncio
+
+from tplearn.status import StatusUpdater #pylint: disable=import-error
+from test.utils import NvimTestClient
+
+
+def shown(nvim):
+    return [args[0] for name, args in nvim.requests
+            if name == 'tplearn#util#status']
+
+def test_status_coalesce_updates():
+    nvim = NvimTestClient()
+    status = StatusUpdater(nvim, interval=0.05)
+
+    status.update({}, 'Recording:')
+    status.update({}, 'Recording:')
+    assert shown(nvim) == ['Recording: no fixes']
+
+    for fix in ['d', 'do', 'dog']:
+        status.update({'dgo': fix}, 'Recording:')
+
+    assert shown(nvim) == ['Recording: no fixes']
+
+    nvim.loop.run_until_complete(asyncio.sleep(0.1))
+    assert shown(nvim) == ['Recording: no fixes',
+                           'Recording: "dgo" => "dog"']
+
+    status.reset()
+    nvim.loop.close()
+
+def test_status_unchanged_abbreviations():
+    nvim = NvimTestClient()
+    status = StatusUpdater(nvim, interval=0)
+
+    for _ in range(10):
+        status.update({'dgo': 'dog', 'teh': 'the'}, 'Recording:')
+
+    assert shown(nvim) == ['Recording: "dgo" => "dog", "teh" => "the"']
+    nvim.loop.close()
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_store.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import os
+import stat
+
+from tplearn.store import AbbreviationFile #pylint: disable=import-error
+
+
+def test_compact(tmp_path):
+    tpfile = AbbreviationFile(str(tmp_path / 'all.vim'))
+    tpfile.compact({'jmps': 'jumps', 'teh': 'the', 'Tge': 'The'})
+
+    lines = (tmp_path / 'all.vim').read_text().split('\n')
+    assert lines[1:] == ['" j',
+                         'call tplearn#util#abbreviate("jmps", "jumps")',
+                         '',
+                         '" t',
+                         'call tplearn#util#abbreviate("teh", "the")',
+                         'call tplearn#util#abbreviate("Tge", "The")',
+                         '']
+    assert not tpfile.needs_compaction()
+    assert [p.name for p in tmp_path.iterdir()] == ['all.vim']
+
+def test_compact_symlink(tmp_path):
+    target = tmp_path / 'dotfiles' / 'all.vim'
+    target.parent.mkdir()
+    target.write_text('call tplearn#util#abbreviate("teh", "the")\n')
+    target.chmod(0o600)
+    link = tmp_path / 'all.vim'
+    link.symlink_to(target)
+
+    AbbreviationFile(str(link)).compact({'teh': 'the', 'jmps': 'jumps'})
+
+    assert link.is_symlink()
+    assert 'jmps' in target.read_text()
+    assert stat.S_IMODE(os.stat(target).st_mode) == 0o600
+    assert sorted(p.name for p in target.parent.iterdir()) == ['all.vim']
+
+def test_append(tmp_path):
+    path = tmp_path / 'all.vim'
+    path.write_text('call tplearn#util#abbreviate("teh", "the")')
+
+    tpfile = AbbreviationFile(str(path))
+    tpfile.append({'jmps': 'jumps', 'dgo': 'dog'})
+
+    assert path.read_text().split('\n') == [
+        'call tplearn#util#abbreviate("teh", "the")',
+        'call tplearn#util#abbreviate("dgo", "dog")',
+        'call tplearn#util#abbreviate("jmps", "jumps")',
+        '']
+
+def test_needs_compaction(tmp_path):
+    tpfile = AbbreviationFile(str(tmp_path / 'all.vim'))
+    assert tpfile.needs_compaction()
+
+    tpfile.compact({f'typo{i}': f'fix{i}' for i in range(1000)})
+    tpfile.append({'dgo': 'dog'})
+    assert not tpfile.needs_compaction()
+
+    tpfile.append({f'tpyo{i}': f'fix{i}' for i in range(1000)})
+    assert tpfile.needs_compaction()
+
+def test_read(tmp_path):
+    tpfile = AbbreviationFile(str(tmp_path / 'all.vim'))
+    tpfile.compact({'jmps': 'jumps', 'teh': 'the'})
+    tpfile.append({'dgo': 'dog', 'teh': 'then'})
+
+    assert tpfile.read() == {'jmps': 'jumps', 'teh': 'then', 'dgo': 'dog'}
+
+    with open(tpfile.path, 'a') as other:
+        other.write('iabbrev helloworld helloworld2\n')
+
+    assert tpfile.read() is None
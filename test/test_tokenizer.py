@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+TypitLearn plugin for Neovim
+
+File: test_tokenizer.py
+Author: Gabriel Alcaras
+License: GNU GPL v3
+"""
+
+import re
+import timeit
+
+import pytest
+
+from tplearn.tokenizer import Tokenizer #pylint: disable=import-error
+
+LONG_LINE = ' '.join(f'word{i}, foo-bar.' for i in range(500))
+
+
+def split_words(line):
+    """Tokenizer used by the tracker before Tokenizer"""
+    word_re = re.compile(r'[^\w]')
+    return [w for p in line.split(' ') for w in word_re.split(p)]
+
+def test_tokenizer_words():
+    tokenizer = Tokenizer()
+    line = 'The quick brown fox jmps. Over the lazy-dgo!'
+
+    assert tokenizer.words(line) == ('The', 'quick', 'brown', 'fox', 'jmps',
+                                     'Over', 'the', 'lazy', 'dgo')
+    assert tokenizer.words(line, 4, 15) == ('quick', 'brown')
+    assert tokenizer.cached_tokens(line).words == tokenizer.words(line)
+    assert tokenizer.cached_tokens(line).between(4, 15) == ('quick', 'brown')
+    assert [w for w in split_words(line) if w] == list(tokenizer.words(line))
+
+@pytest.mark.benchmark
+def test_tokenizer_throughput():
+    tokenizer = Tokenizer()
+    new_line = LONG_LINE + ' x'
+
+    def before():
+        split_words(LONG_LINE)
+        split_words(new_line)
+
+    def after():
+        tokenizer.cached_tokens(LONG_LINE)
+        tokenizer.words(new_line)
+
+    before_time = min(timeit.repeat(before, number=50, repeat=3))
+    after_time = min(timeit.repeat(after, number=50, repeat=3))
+
+    assert after_time < before_time
+
+def test_tokenizer_changed_window():
+    tokenizer = Tokenizer()
+    old = 'The quick brown fox jmps over the lazy dgo'
+
+    assert tokenizer.changed_window(old, old.replace('jmps', 'jumps')) == (20, 24, 25)
+    assert tokenizer.changed_window(old, old.replace('jmps', 'jps')) == (20, 24, 23)
+    assert tokenizer.changed_window(old, old.replace(' over', '')) == (25, 33, 28)
+    assert tokenizer.changed_window(old, old + ' !') == (39, 42, 44)
+    assert tokenizer.changed_window(old, old) == (42, 42, 42)
+    assert tokenizer.changed_window('aaa', 'aa') == (0, 3, 2)
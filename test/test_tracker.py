@@ -7,7 +7,11 @@ Author: Gabriel Alcaras
 License: GNU GPL v3
 """
 
+import time
 from collections import OrderedDict
+
+import pytest
+
 from tplearn import tracker #pylint: disable=import-error
 from test.utils import NvimTestBuffer
 
@@ -159,3 +163,190 @@ def test_order_abbrev():
                                             'jmps': 'jumps'})
 
     TRACKER.reset()
+
+def test_tracker_shifted_lines():
+    TRACKER.reset()
+
+    buf = NvimTestBuffer(['Some text', 'The lazy dgo', 'Other stuff'])
+    changes = [buf, 0, 2, buf[:]]
+    TRACKER.track_buffer_updates(*changes)
+
+    # Insert two lines, then delete the first one: the typo moved down
+    TRACKER.track_replaced_words(buf, 0, 0, ['Inserted', 'Inserted'])
+    TRACKER.track_replaced_words(buf, 0, 1, [])
+    TRACKER.track_replaced_words(buf, 2, 3, ['The lazy dog'])
+    assert TRACKER.abbrev() == {'dgo': 'dog'}
+
+    TRACKER.reset()
+
+def test_tracker_multiple_lines():
+    TRACKER.reset()
+
+    buf = NvimTestBuffer(['The quick brown fox jmps over',
+                          'the lazy dgo.',
+                          'Nothing to see here',
+                          'Teh end'])
+    changes = [buf, 0, 4, buf[:]]
+    TRACKER.track_buffer_updates(*changes)
+
+    # Substitute on several lines at once
+    changes = [buf, 0, 4, ['The quick brown fox jumps over',
+                           'the lazy dgo.',
+                           'Nothing to see here',
+                           'The end']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev() == {'jmps': 'jumps', 'Teh': 'The'}
+
+    # Join the two first lines, fixing a typo on the way
+    changes = [buf, 0, 2, ['The quick brown fox jumps over the lazy dog.']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev() == {'jmps': 'jumps', 'Teh': 'The', 'dgo': 'dog'}
+
+    # Lines after the join are still compared to the right original line
+    changes = [buf, 1, 2, ['Nothing to see hree']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev()['here'] == 'hree'
+
+    TRACKER.reset()
+
+def test_tracker_paste_over_lines():
+    TRACKER.reset()
+
+    buf = NvimTestBuffer(['First line', 'Frist typo', 'Scond typo', 'Last'])
+    changes = [buf, 0, 4, buf[:]]
+    TRACKER.track_buffer_updates(*changes)
+
+    # Paste three lines over two lines
+    changes = [buf, 1, 3, ['First typo', 'Second typo', 'Extra line']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev() == {'Frist': 'First', 'Scond': 'Second'}
+
+    TRACKER.reset()
+
+def test_tracker_insert_word_before_fix():
+    TRACKER.reset()
+
+    buf = NvimTestBuffer(['The quick brown fox jmps over the lazy dgo'])
+    changes = [buf, 0, 1, buf[:]]
+    TRACKER.track_buffer_updates(*changes)
+
+    changes = [buf, 0, 1, ['The very quick fox jmps over the lazy dog']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev() == {'dgo': 'dog'}
+
+    changes = [buf, 0, 1, ['The quick brown fox jumps ovr the lazy dog']]
+    TRACKER.track_replaced_words(*changes)
+    assert TRACKER.abbrev() == {'dgo': 'dog', 'jmps': 'jumps', 'over': 'ovr'}
+
+    TRACKER.reset()
+
+def test_tracker_long_line():
+    TRACKER.reset()
+
+    words = [f'word{i}' for i in range(2000)]
+    buf = NvimTestBuffer([','.join(words)])
+    changes = [buf, 0, 1, buf[:]]
+    TRACKER.track_buffer_updates(*changes)
+
+    words[1000] = 'wrod1000'
+    words.insert(10, 'inserted')
+    start = time.perf_counter()
+    changes = [buf, 0, 1, [','.join(words)]]
+    TRACKER.track_replaced_words(*changes)
+
+    # Order of magnitude only: a full diff of the line takes minutes
+    assert time.perf_counter() - start < 5
+    assert TRACKER.abbrev() == {'word1000': 'wrod1000'}
+
+    TRACKER.reset()
+
+def time_keystrokes(num_words, events=100):
+    tracker_ = tracker.TypitLearnTracker()
+    words = [f'word{i}' for i in range(num_words)]
+    buf = NvimTestBuffer([' '.join(words)])
+    tracker_.track_buffer_updates(buf, 0, 1, buf[:])
+
+    # Retype a word in the middle of the line, one character at a time
+    middle = num_words // 2
+    typed = [f'wrod{middle}'[:i] for i in range(1, len(f'word{middle}') + 1)]
+    lines = [' '.join(words[:middle] + [t] + words[middle+1:]) for t in typed]
+
+    start = time.perf_counter()
+    for i in range(events):
+        tracker_.track_replaced_words(buf, 0, 1, [lines[i % len(lines)]])
+    tracker_.track_replaced_words(buf, 0, 1, [lines[-1]])
+
+    assert tracker_.abbrev() == {f'word{middle}': f'wrod{middle}'}
+    return (time.perf_counter() - start) / events
+
+def test_tracker_large_substitution():
+    TRACKER.reset()
+
+    lines = [f'line{i} wrod' for i in range(20000)]
+    buf = NvimTestBuffer(lines)
+    TRACKER.track_buffer_updates(buf, 0, len(lines), buf[:])
+
+    # :%s reports one event from the first to the last changed line
+    fixed = [line.replace('wrod', 'word') if i % 5 == 0 else line
+             for i, line in enumerate(lines)]
+    start = time.perf_counter()
+    TRACKER.track_replaced_words(buf, 0, len(lines), fixed)
+
+    # Order of magnitude only: a full diff of the lines takes minutes
+    assert time.perf_counter() - start < 5
+    assert TRACKER.abbrev() == {'wrod': 'word'}
+
+    # Too many added lines are stored without being diffed
+    TRACKER.track_replaced_words(buf, 0, 1, fixed[:1] * tracker.MAX_DIFF_LINES)
+    assert TRACKER.abbrev() == {'wrod': 'word'}
+
+    TRACKER.reset()
+
+@pytest.mark.benchmark
+def test_tracker_cost_proportional_to_edit():
+    short = min(time_keystrokes(20) for _ in range(3))
+    long = min(time_keystrokes(2000) for _ in range(3))
+
+    assert long < short * 5
+
+def test_abbrev_view():
+    tracker_ = tracker.TypitLearnTracker()
+    buf = NvimTestBuffer(['The quick brown fox jmps over the lazy dgo'])
+    tracker_.track_buffer_updates(buf, 0, 1, buf[:])
+
+    for fix in ['', 'd', 'do', 'dog', 'dgo', 'dog']:
+        line = 'The quick brown fox jmps over the lazy ' + fix
+        tracker_.track_replaced_words(buf, 0, 1, [line])
+
+    assert tracker_.abbrev() is tracker_.abbrev()
+    assert tracker_.abbrev() == {'dgo': 'dog'}
+    assert tracker_._abbrev == {'dgo': 'dog'}
+
+    with pytest.raises(TypeError):
+        tracker_.abbrev()['teh'] = 'the'
+
+def test_tracker_lazy_snapshot():
+    lazy_tracker = tracker.TypitLearnTracker()
+    buf = NvimTestBuffer(['The quick brown fox jmps over the lazy dgo'] * 3)
+    lazy_tracker.track_lazily(buf, 3)
+
+    # Unknown lines become known when they change, without fixes
+    lazy_tracker.track_replaced_words(buf, 0, 1, ['The quick brown fox'])
+    assert lazy_tracker.abbrev() == {}
+
+    # Prefetched lines are compared to their new content
+    lazy_tracker.prefetch(buf.number, 1, ['The quick brown fox jmps over',
+                                          'the lazy dgo'])
+    lazy_tracker.track_replaced_words(buf, 1, 2, ['The quick brown fox jumps over'])
+    lazy_tracker.track_replaced_words(buf, 0, 1, ['The quick brown fox was'])
+    assert lazy_tracker.abbrev() == {'jmps': 'jumps'}
+
+    # Known lines are never overwritten by prefetched ones
+    lazy_tracker.prefetch(buf.number, 2, ['the lazy dog'])
+    lazy_tracker.track_replaced_words(buf, 2, 3, ['the lazy dog'])
+    assert lazy_tracker.abbrev() == {'dgo': 'dog', 'jmps': 'jumps'}
+
+    # Lines joined with unknown lines are stored as is
+    lazy_tracker.track_lazily(buf, 3)
+    lazy_tracker.track_replaced_words(buf, 0, 2, ['jmps dgo'])
+    assert lazy_tracker.abbrev() == {'dgo': 'dog', 'jmps': 'jumps'}
@@ -7,12 +7,16 @@ Author: Gabriel Alcaras
 License: GNU GPL v3
 """
 
+import asyncio
 import tempfile
 import textwrap
 
 import pytest
 
 from neovim import attach
+from tplearn import TypitLearn #pylint: disable=import-error
+
+LINE = 'The quick brown fox jmps over the lazy dgo'
 
 def mktemp_with_lines(lines):
     tmp_path = tempfile.mkstemp()[1]
@@ -91,9 +95,9 @@ class NvimInstance(object):
                 no_match = False
                 return cur_event
 
-    def play_record(self, changes=None, feedkeys=None):
+    def play_record(self, changes=None):
         changes = [] if changes is None else changes
-        def sequence(feedkeys):
+        def sequence():
             self.nvim.command('TypitLearnRecord')
             yield self.wait_for_event('tp_record', 'start')
 
@@ -101,20 +105,21 @@ class NvimInstance(object):
                 self.nvim.current.buffer[numline] = line
 
             self.nvim.command('TypitLearnRecord')
-
-            if feedkeys:
-                for key in feedkeys:
-                    yield self.wait_for_event('tp_record', 'ask')
-                    self.nvim.input(key)
-
             yield self.wait_for_event('tp_record', 'stop')
 
         self.nvim.subscribe('tp_record')
-        for _ in sequence(feedkeys):
+        for _ in sequence():
             pass
 
         self.nvim.unsubscribe('tp_record')
 
+    def review(self, keep):
+        """Keep fixes of typos in keep in the review buffer, then write it"""
+        buf = self.nvim.current.buffer
+        buf[:] = [line for line in buf[:]
+                  if ' => ' not in line or line.split(' => ')[0] in keep]
+        self.nvim.command('write')
+
     def undo(self):
         self.nvim.subscribe('tp_record')
         self.nvim.command('TypitLearnUndo')
@@ -148,6 +153,58 @@ class NvimTestBuffer(object):
     def __init__(self, content, number=1):
         self._content = content
         self.number = number
+        self.fetched_lines = 0
+        self.valid = True
 
     def __getitem__(self, idx):
-        return self._content[idx]
+        lines = self._content[idx]
+        self.fetched_lines += len(lines) if isinstance(idx, slice) else 1
+        return lines
+
+def tplearn_config(tpdir, **values):
+    """Values returned by tplearn#util#config() for a NvimTestClient"""
+    return {'dir': str(tpdir), 'undo': 1, 'spellcheck': 0, 'lazy': 0,
+            'fix_all_buffers': 0, 'status_interval': 100, 'home': '',
+            'xdg_config_home': '', 'has_nvim': 1, 'lazy_snapshot': 0,
+            **values}
+
+class NvimTestClient(object):
+
+    """Record requests sent to Neovim instead of sending them"""
+
+    def __init__(self, line_count=0, responses=None):
+        self.requests = []
+        self.line_count = line_count
+        self.responses = responses or {}
+        self.vars = {}
+        self.buffers = {}
+        self.loop = asyncio.new_event_loop()
+
+    def call(self, name, *args, **kwargs):
+        self.requests.append((name, args))
+        response = self.responses.get(name)
+        return response(*args) if callable(response) else response
+
+    def command(self, command, **kwargs):
+        self.requests.append(('nvim_command', (command,)))
+
+    def request(self, name, *args, **kwargs):
+        self.requests.append((name, args))
+
+        if name == 'nvim_buf_line_count':
+            return self.line_count
+
+        if name == 'nvim_call_atomic':
+            return [[None] * len(args[0]), None]
+
+        return self.responses.get(name)
+
+def start_record(num_lines):
+    """Plugin recording a NvimTestBuffer of num_lines lines"""
+
+    plugin = TypitLearn(NvimTestClient())
+    buf = NvimTestBuffer([LINE] * num_lines)
+    plugin._start_session(buf)
+    plugin._on_buf_lines_event(buf, 1, 0, -1, buf._content, False)
+
+    return plugin, buf